@@ -1,5 +1,6 @@
 """REST API для News Aggregator."""
 from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
@@ -347,7 +348,8 @@ async def get_logs(
     logger.info(f"Запрос логов: limit={limit}, session_id={session_id}, level={level}")
     try:
         log_manager = get_log_manager()
-        logs = log_manager.get_logs(limit=limit, session_id=session_id)
+        # Ожидание фоновой записи и Redis не должны блокировать event loop
+        logs = await run_in_threadpool(log_manager.get_logs, limit=limit, session_id=session_id)
 
         # Фильтрация по уровню
         if level:
@@ -365,7 +367,7 @@ async def clear_logs(session_id: Optional[str] = None):
     logger.info(f"Запрос очистки логов: session_id={session_id}")
     try:
         log_manager = get_log_manager()
-        log_manager.clear_logs(session_id=session_id)
+        await run_in_threadpool(log_manager.clear_logs, session_id=session_id)
         logger.info(f"Логи очищены (сессия: {session_id or 'все'})")
         return {"message": f"Логи очищены (сессия: {session_id or 'все'})"}
     except Exception as e:
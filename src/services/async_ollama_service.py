@@ -0,0 +1,286 @@
+"""Асинхронный клиент Ollama для конкурентных LLM и embedding запросов."""
+import time
+import asyncio
+import logging
+from typing import Optional, List, Dict, Any
+
+import aiohttp
+import numpy as np
+
+from src.utils import json_utils
+from src.services.ollama_service import OllamaService, _encode_body, _RETRY_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOllamaService(OllamaService):
+    """
+    Асинхронный клиент Ollama API на aiohttp.
+
+    Использует ту же конфигурацию и подготовку запросов, что и OllamaService
+    (лимиты токенов, обрезка промптов, options), но выполняет HTTP без
+    блокировки, поэтому несколько запросов можно выполнять одновременно:
+
+        results = await asyncio.gather(*[svc.generate_async(p) for p in prompts])
+
+    Число одновременных запросов к Ollama ограничивается семафором.
+    """
+
+    def __init__(self, *args, max_concurrency: int = 8, **kwargs):
+        """
+        Инициализация асинхронного сервиса.
+
+        Args:
+            *args: Аргументы OllamaService.
+            max_concurrency: Максимум одновременных запросов к Ollama.
+            **kwargs: Именованные аргументы OllamaService.
+        """
+        super().__init__(*args, **kwargs)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[aiohttp.ClientSession] = None
+
+    async def _get_client(self) -> aiohttp.ClientSession:
+        """Ленивое создание aiohttp сессии внутри работающего event loop."""
+        if self._client is None or self._client.closed:
+            self._client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=16, keepalive_timeout=75)
+            )
+        return self._client
+
+    async def close(self) -> None:
+        """Закрытие aiohttp сессии."""
+        if self._client is not None and not self._client.closed:
+            await self._client.close()
+
+    async def __aenter__(self) -> "AsyncOllamaService":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def _post_json_async(self, path: str, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """
+        POST-запрос с повторами при 429/5xx и экспоненциальной задержкой.
+
+        Endpoint выбирается из пула OllamaService; если он не ответил после
+        всех попыток, запрос переносится на следующий доступный endpoint.
+
+        Args:
+            path: Путь API, например "/api/chat"
+            payload: Тело запроса
+            timeout: Таймаут запроса в секундах
+
+        Returns:
+            Распарсенный JSON ответа
+
+        Raises:
+            aiohttp.ClientError: Если запрос не удался на всех endpoint'ах
+            asyncio.TimeoutError: При превышении таймаута на всех endpoint'ах
+        """
+        body, headers = _encode_body(payload)
+        client = await self._get_client()
+        tried = []
+
+        async with self._semaphore:
+            while True:
+                url = self._endpoints.next_endpoint(exclude=tried, kind=path)
+                tried.append(url)
+                start = time.perf_counter()
+                try:
+                    data = await self._post_with_retries(client, self._api_urls[url][path], body, headers, timeout)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # Ошибки клиента (4xx) не говорят о здоровье endpoint'а
+                    if isinstance(e, aiohttp.ClientResponseError) and e.status not in _RETRY_STATUSES:
+                        raise
+                    self._endpoints.record_failure(url)
+                    if len(tried) >= len(self._endpoints):
+                        raise
+                    logger.debug("Повтор %s на другом endpoint'е после ошибки %s", path, url)
+                    continue
+
+                self._endpoints.record_success(url, time.perf_counter() - start, kind=path)
+                return data
+
+    async def _post_with_retries(
+            self,
+            client: aiohttp.ClientSession,
+            url: str,
+            body: bytes,
+            headers: Dict[str, str],
+            timeout: float
+    ) -> Dict[str, Any]:
+        """Один endpoint: повторы при 429/5xx с задержкой 1, 2, 4... секунд."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with client.post(
+                    url,
+                    data=body,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as response:
+                    response.raise_for_status()
+                    return json_utils.loads(await response.read())
+            except aiohttp.ClientResponseError as e:
+                if e.status not in _RETRY_STATUSES or attempt == self.max_retries:
+                    raise
+                delay = 2 ** attempt
+                logger.warning(f"Ollama вернул {e.status}, повтор через {delay}с")
+                await asyncio.sleep(delay)
+
+    async def chat_async(
+            self,
+            messages: List[Dict[str, str]],
+            temperature: float = 0.7,
+            max_tokens: Optional[int] = None,
+            model: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Асинхронный чат через /api/chat.
+
+        Args:
+            messages: Список сообщений в формате [{"role": "system/user/assistant", "content": "..."}]
+            temperature: Температура сэмплирования.
+            max_tokens: Максимальное количество токенов для генерации.
+            model: Модель для этого запроса. Если None, используется модель сервиса.
+
+        Returns:
+            Сгенерированный текст или None при ошибке.
+        """
+        payload = self._chat_payload(messages, temperature, max_tokens, model or self.model, stream=False)
+
+        try:
+            data = await self._post_json_async("/api/chat", payload, self.timeout)
+
+            if "message" in data and "content" in data["message"]:
+                return data["message"]["content"].strip()
+            logger.error(f"Неожиданный формат ответа: {data}")
+            return None
+
+        except asyncio.TimeoutError:
+            logger.error(f"Ollama request timeout after {self.timeout}s")
+            return None
+        except aiohttp.ClientError as e:
+            logger.error(f"Ollama request failed: {e}")
+            return None
+        except (KeyError, ValueError) as e:
+            logger.error(f"Invalid response format: {e}")
+            return None
+
+    async def generate_async(
+            self,
+            prompt: str,
+            system: Optional[str] = None,
+            temperature: float = 0.7,
+            max_tokens: Optional[int] = None,
+            model: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Асинхронная генерация текста.
+
+        Если передан system prompt, использует /api/chat, иначе /api/generate.
+
+        Args:
+            prompt: Пользовательский промт.
+            system: Системный промт.
+            temperature: Температура сэмплирования.
+            max_tokens: Максимальное количество токенов для генерации.
+            model: Модель для этого запроса. Если None, используется модель сервиса.
+
+        Returns:
+            Сгенерированный текст или None при ошибке.
+        """
+        model = model or self.model
+
+        if system:
+            messages = [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ]
+            return await self.chat_async(messages, temperature, max_tokens, model)
+
+        payload = self._generate_payload(prompt, temperature, max_tokens, model)
+
+        try:
+            data = await self._post_json_async("/api/generate", payload, self.timeout)
+            return data.get("response", "").strip()
+
+        except asyncio.TimeoutError:
+            logger.error(f"Ollama request timeout after {self.timeout}s")
+            return None
+        except aiohttp.ClientError as e:
+            logger.error(f"Ollama request failed: {e}")
+            return None
+        except (KeyError, ValueError) as e:
+            logger.error(f"Invalid response format: {e}")
+            return None
+
+    async def get_embeddings_async(
+            self,
+            texts: List[str],
+            model: Optional[str] = None,
+            batch_size: int = 64
+    ) -> Optional[List[List[float]]]:
+        """
+        Асинхронная пакетная генерация embeddings через /api/embed.
+
+        Пачки по batch_size отправляются одновременно.
+
+        Args:
+            texts: Список текстов для векторизации.
+            model: Название embedding модели. Если None, используется модель сервиса.
+            batch_size: Максимальное количество текстов в одном запросе.
+
+        Returns:
+            Список векторов в порядке входных текстов или None при ошибке.
+        """
+        embedding_model = model or self.embedding_model
+        prepared = self._prepare_embedding_texts(texts)
+        chunks = [prepared[i:i + batch_size] for i in range(0, len(prepared), batch_size)]
+
+        try:
+            responses = await asyncio.gather(*[
+                self._post_json_async(
+                    "/api/embed",
+                    {"model": embedding_model, "input": chunk},
+                    30 + len(chunk)
+                )
+                for chunk in chunks
+            ])
+
+            embeddings: List[List[float]] = []
+            for chunk, data in zip(chunks, responses):
+                chunk_embeddings = data.get("embeddings")
+                if not chunk_embeddings or len(chunk_embeddings) != len(chunk):
+                    logger.error("Ollama не вернул embeddings для всех текстов")
+                    return None
+                embeddings.extend(chunk_embeddings)
+
+            return embeddings
+
+        except asyncio.TimeoutError:
+            logger.error("Таймаут получения embedding")
+            return None
+        except aiohttp.ClientError as e:
+            logger.error(f"Ошибка получения embedding: {e}")
+            return None
+        except (KeyError, ValueError) as e:
+            logger.error(f"Неверный формат ответа embedding: {e}")
+            return None
+
+    async def get_embedding_async(self, text: str, model: Optional[str] = None) -> Optional[np.ndarray]:
+        """
+        Асинхронная генерация embedding вектора для одного текста.
+
+        Args:
+            text: Входной текст для векторизации.
+            model: Название embedding модели. Если None, используется модель сервиса.
+
+        Returns:
+            Вектор float32 или None при ошибке или пустом тексте.
+        """
+        # Как и get_embedding: пустой текст не отправляется в Ollama
+        if not text or not text.strip():
+            return None
+
+        embeddings = await self.get_embeddings_async([text], model)
+        return np.asarray(embeddings[0], dtype=np.float32) if embeddings else None
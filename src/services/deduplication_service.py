@@ -22,7 +22,12 @@ class DeduplicationService:
         """Инициализация сервиса."""
         self.qdrant_host = os.getenv("QDRANT_HOST", "qdrant")
         self.qdrant_port = int(os.getenv("QDRANT_PORT", 6333))
-        self.client = QdrantClient(host=self.qdrant_host, port=self.qdrant_port)
+        self.client = QdrantClient(
+            host=self.qdrant_host,
+            port=self.qdrant_port,
+            prefer_grpc=os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true",
+            grpc_port=int(os.getenv("QDRANT_GRPC_PORT", 6334))
+        )
         self.ollama = get_ollama_service()
         self.embedding_model = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
 
@@ -79,7 +84,7 @@ class DeduplicationService:
 
             # Получаем вектор
             vector = self.ollama.get_embedding(text, self.embedding_model)
-            if not vector:
+            if vector is None:
                 logger.error(f"Не удалось получить вектор для текста")
                 return None
 
@@ -89,7 +94,7 @@ class DeduplicationService:
             # Создаем точку
             point = PointStruct(
                 id=point_id,  # Используем UUID вместо строкового ID
-                vector=vector,
+                vector=vector.tolist(),
                 payload={
                     "record_id": record_id,  # Сохраняем оригинальный ID в payload
                     "source": source,
@@ -183,16 +188,19 @@ class DeduplicationService:
 
             # Получаем вектор
             vector = self.ollama.get_embedding(text, self.embedding_model)
-            if not vector:
+            if vector is None:
                 logger.error(f"Не удалось получить вектор для текста")
                 return False, None, 0.0
 
             # Ищем похожие векторы
             search_result = self.client.search(
                 collection_name=collection_name,
-                query_vector=vector,
+                query_vector=vector.tolist(),
                 limit=1,
-                score_threshold=threshold
+                score_threshold=threshold,
+                # Нужен только ID записи; векторы в ответе не нужны
+                with_payload=["record_id"],
+                with_vectors=False
             )
 
             if search_result:
@@ -235,25 +243,28 @@ class DeduplicationService:
 
             # Получаем вектор
             vector = self.ollama.get_embedding(text, self.embedding_model)
-            if not vector:
+            if vector is None:
                 logger.error(f"Не удалось получить вектор для текста")
                 return []
 
             # Ищем похожие векторы
             search_result = self.client.search(
                 collection_name=collection_name,
-                query_vector=vector,
+                query_vector=vector.tolist(),
                 limit=limit,
-                score_threshold=threshold
+                score_threshold=threshold,
+                with_payload=True,
+                with_vectors=False
             )
 
             results = []
             for result in search_result:
+                payload = result.payload or {}
                 results.append({
-                    "record_id": result.payload.get("record_id"),
-                    "source": result.payload.get("source"),
+                    "record_id": payload.get("record_id"),
+                    "source": payload.get("source"),
                     "similarity": result.score,
-                    "metadata": result.payload
+                    "metadata": payload
                 })
 
             return results
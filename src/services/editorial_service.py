@@ -1,14 +1,108 @@
 """Сервис редакторской обработки через Ollama models."""
 import os
 import json
+import time
+import hashlib
 import xml.etree.ElementTree as ET
 from pathlib import Path
 from typing import Optional, Dict, Any
 import logging
+import numpy as np
+from src.utils import json_utils
 from src.services.ollama_service import get_ollama_service
 
 logger = logging.getLogger(__name__)
 
+# Настройки окружения читаются один раз при импорте модуля
+_DEFAULT_MODEL = os.getenv("LLM_MODEL") or os.getenv("OLLAMA_MODEL") or "gpt-oss:20b"
+_OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "true").lower() == "true"
+_NEWS_PREFILTER = os.getenv("NEWS_PREFILTER", "false").lower() == "true"
+_NEWS_PREFILTER_THRESHOLD = float(os.getenv("NEWS_PREFILTER_THRESHOLD", "0.25"))
+_APP_DATA_DIR = Path(os.getenv("APP_DATA_DIR", "/app/data"))
+
+# Эталонные новостные заголовки для предварительного фильтра
+_NEWS_HEADLINES_PATH = Path(__file__).parent.parent / "config" / "news_headlines.json"
+
+# Статичные части системных промптов: собираются один раз при импорте модуля
+_EDITORIAL_FORMAT_RULES = """
+КРИТИЧЕСКИ ВАЖНО - ФОРМАТ ОТВЕТА:
+
+Ты ОБЯЗАН вернуть ТОЛЬКО валидный JSON без какого-либо дополнительного текста.
+
+Если статья ПОДХОДИТ для технического канала (релевантность > 0.6):
+{
+  "is_news": true,
+  "original_summary": "краткое резюме оригинала",
+  "rewritten_post": "полностью переписанный текст от первого лица",
+  "title": "цепляющий заголовок",
+  "teaser": "краткая аннотация 2-3 предложения",
+  "image_prompt": "описание для генерации изображения",
+  "relevance_score": 0.85,
+  "relevance_reason": "объяснение почему подходит",
+  "content_type": "news|research|tutorial|humor|meme|discussion"
+}
+
+Если статья НЕ ПОДХОДИТ (релевантность <= 0.6):
+{
+  "is_news": false,
+  "relevance_score": 0.3,
+  "relevance_reason": "детальное объяснение почему не подходит",
+  "original_summary": "краткое резюме оригинала"
+}
+
+ПРАВИЛА:
+1. ВСЕГДА заполняй is_news как true или false
+2. ВСЕГДА заполняй relevance_score числом от 0.0 до 1.0
+3. ВСЕГДА заполняй relevance_reason текстом (минимум 10 слов)
+4. НИКОГДА не используй значения: "N/A", "None", null, пустые строки
+5. Если is_news=true, ВСЕ поля обязательны и должны содержать значимый контент
+6. Переписывай от первого лица множественного числа ("мы обнаружили")
+7. Текст БЕЗ markdown форматирования (без **, *, #)
+8. ТОЛЬКО JSON в ответе - без вступлений, объяснений, комментариев"""
+
+_TELEGRAM_FORMAT_RULES = """
+ФОРМАТ ВЫВОДА (ТОЛЬКО JSON):
+{
+  "telegram_title": "заголовок для Telegram",
+  "telegram_content": "сжатый контент до 3500 символов",
+  "telegram_hashtags": "#тег1 #тег2 #тег3",
+  "telegram_formatted": "контент с markdown форматированием",
+  "character_count": 1234
+}
+
+ПРАВИЛА:
+1. Максимум 3500 символов с пробелами
+2. Используй markdown: **жирный**, *курсив*, `код`
+3. 3-5 релевантных хештегов через пробел
+4. НЕ используй эмодзи
+5. Структурируй для мобильного чтения
+6. ТОЛЬКО JSON без дополнительного текста"""
+
+
+# Шаблоны пользовательских сообщений, заполняются через str.format
+_EDITORIAL_USER_TEMPLATE = """Обработай следующий технический пост:
+
+<<<
+Заголовок: {title}
+
+Текст:
+{content}
+>>>
+
+ВАЖНО: Верни ТОЛЬКО JSON без дополнительного текста.
+Все обязательные поля должны быть заполнены валидными значениями.
+"""
+
+_TELEGRAM_USER_TEMPLATE = """Отформатируй следующую статью для Telegram:
+
+<<<
+Заголовок: {title}
+
+Текст:
+{content}
+>>>
+
+ВАЖНО: Верни ТОЛЬКО JSON. Максимум 3500 символов."""
 
 class EditorialService:
     """
@@ -45,9 +139,21 @@ class EditorialService:
             telegram_prompt_path: Путь к XML файлу с промптом для Telegram.
             model: Название модели Ollama.
         """
-        self.model = model or os.getenv("LLM_MODEL") or os.getenv("OLLAMA_MODEL") or "gpt-oss:20b"
+        self.model = model or _DEFAULT_MODEL
+        # Модель передается в каждый запрос: общий singleton OllamaService не изменяется
         self.ollama = get_ollama_service()
-        self.ollama.model = self.model
+
+        # Загружаем модель заранее в фоне, чтобы первый пост не ждал холодного
+        # старта, а создание сервиса не блокировалось
+        if _OLLAMA_WARMUP:
+            self.ollama.warmup_in_background(self.model)
+
+        # Предварительный фильтр: посты, далекие по эмбеддингу от эталонных
+        # новостей, отсеиваются без вызова большой модели
+        self.prefilter_enabled = _NEWS_PREFILTER
+        self.prefilter_threshold = _NEWS_PREFILTER_THRESHOLD
+        self.centroid_cache_path = _APP_DATA_DIR / "news_centroid.json"
+        self._news_centroid: Optional[np.ndarray] = None
 
         # Определение путей к промптам
         base_path = Path(__file__).parent.parent
@@ -60,12 +166,13 @@ class EditorialService:
 
     def _load_prompt(self) -> str:
         """Загружает и парсит XML промпт в текстовую инструкцию."""
-        if not self.prompt_path.exists():
+        try:
+            data = self.prompt_path.read_bytes()
+        except FileNotFoundError:
             raise FileNotFoundError(f"Editorial prompt not found: {self.prompt_path}")
 
         try:
-            tree = ET.parse(self.prompt_path)
-            root = tree.getroot()
+            root = ET.fromstring(data)
 
             system_role = root.find('.//system_role/identity').text.strip()
             objective = root.find('.//objective/goal').text.strip()
@@ -77,62 +184,25 @@ class EditorialService:
                 step_instruction = step.find('instruction').text.strip()
                 steps.append(f"{step_num}. {step_name}\n{step_instruction}")
 
-            system_prompt = f"""
-{system_role}
-
-ЦЕЛЬ: {objective}
-
-ИНСТРУКЦИЯ:
-{chr(10).join(steps)}
-
-КРИТИЧЕСКИ ВАЖНО - ФОРМАТ ОТВЕТА:
-
-Ты ОБЯЗАН вернуть ТОЛЬКО валидный JSON без какого-либо дополнительного текста.
-
-Если статья ПОДХОДИТ для технического канала (релевантность > 0.6):
-{{
-  "is_news": true,
-  "original_summary": "краткое резюме оригинала",
-  "rewritten_post": "полностью переписанный текст от первого лица",
-  "title": "цепляющий заголовок",
-  "teaser": "краткая аннотация 2-3 предложения",
-  "image_prompt": "описание для генерации изображения",
-  "relevance_score": 0.85,
-  "relevance_reason": "объяснение почему подходит",
-  "content_type": "news|research|tutorial|humor|meme|discussion"
-}}
-
-Если статья НЕ ПОДХОДИТ (релевантность <= 0.6):
-{{
-  "is_news": false,
-  "relevance_score": 0.3,
-  "relevance_reason": "детальное объяснение почему не подходит",
-  "original_summary": "краткое резюме оригинала"
-}}
-
-ПРАВИЛА:
-1. ВСЕГДА заполняй is_news как true или false
-2. ВСЕГДА заполняй relevance_score числом от 0.0 до 1.0
-3. ВСЕГДА заполняй relevance_reason текстом (минимум 10 слов)
-4. НИКОГДА не используй значения: "N/A", "None", null, пустые строки
-5. Если is_news=true, ВСЕ поля обязательны и должны содержать значимый контент
-6. Переписывай от первого лица множественного числа ("мы обнаружили")
-7. Текст БЕЗ markdown форматирования (без **, *, #)
-8. ТОЛЬКО JSON в ответе - без вступлений, объяснений, комментариев
-"""
-            return system_prompt.strip()
+            return "".join([
+                system_role,
+                "\n\nЦЕЛЬ: ", objective,
+                "\n\nИНСТРУКЦИЯ:\n", "\n".join(steps),
+                "\n", _EDITORIAL_FORMAT_RULES
+            ])
 
         except Exception as e:
             raise Exception(f"Ошибка парсинга XML промпта: {e}")
 
     def _load_telegram_prompt(self) -> str:
         """Загружает и парсит XML промпт для Telegram."""
-        if not self.telegram_prompt_path.exists():
+        try:
+            data = self.telegram_prompt_path.read_bytes()
+        except FileNotFoundError:
             raise FileNotFoundError(f"Telegram prompt not found: {self.telegram_prompt_path}")
 
         try:
-            tree = ET.parse(self.telegram_prompt_path)
-            root = tree.getroot()
+            root = ET.fromstring(data)
 
             system_role = root.find('.//system_role/identity').text.strip()
             objective = root.find('.//objective/goal').text.strip()
@@ -144,35 +214,81 @@ class EditorialService:
                 step_instruction = step.find('instruction').text.strip()
                 steps.append(f"{step_num}. {step_name}\n{step_instruction}")
 
-            system_prompt = f"""
-{system_role}
+            return "".join([
+                system_role,
+                "\n\nЦЕЛЬ: ", objective,
+                "\n\nИНСТРУКЦИЯ:\n", "\n".join(steps),
+                "\n", _TELEGRAM_FORMAT_RULES
+            ])
 
-ЦЕЛЬ: {objective}
+        except Exception as e:
+            raise Exception(f"Ошибка парсинга XML промпта для Telegram: {e}")
 
-ИНСТРУКЦИЯ:
-{chr(10).join(steps)}
+    def _get_news_centroid(self) -> Optional[np.ndarray]:
+        """
+        Возвращает нормированный центроид эмбеддингов эталонных новостей.
 
-ФОРМАТ ВЫВОДА (ТОЛЬКО JSON):
-{{
-  "telegram_title": "заголовок для Telegram",
-  "telegram_content": "сжатый контент до 3500 символов",
-  "telegram_hashtags": "#тег1 #тег2 #тег3",
-  "telegram_formatted": "контент с markdown форматированием",
-  "character_count": 1234
-}}
+        Центроид вычисляется один раз и кэшируется на диск; кэш
+        инвалидируется при смене embedding модели или списка заголовков.
 
-ПРАВИЛА:
-1. Максимум 3500 символов с пробелами
-2. Используй markdown: **жирный**, *курсив*, `код`
-3. 3-5 релевантных хештегов через пробел
-4. НЕ используй эмодзи
-5. Структурируй для мобильного чтения
-6. ТОЛЬКО JSON без дополнительного текста
-"""
-            return system_prompt.strip()
+        Returns:
+            Вектор центроида или None, если его не удалось построить
+        """
+        if self._news_centroid is not None:
+            return self._news_centroid
 
-        except Exception as e:
-            raise Exception(f"Ошибка парсинга XML промпта для Telegram: {e}")
+        headlines_data = _NEWS_HEADLINES_PATH.read_bytes()
+        cache_key = hashlib.sha1(self.ollama.embedding_model.encode("utf-8") + headlines_data).hexdigest()
+
+        try:
+            cached = json.loads(self.centroid_cache_path.read_text(encoding="utf-8"))
+            if cached.get("key") == cache_key:
+                self._news_centroid = np.asarray(cached["centroid"], dtype=np.float32)
+                return self._news_centroid
+        except (OSError, ValueError, KeyError):
+            pass
+
+        vectors = self.ollama.get_embeddings(json.loads(headlines_data))
+        if not vectors:
+            logger.warning("[EDITORIAL] Не удалось построить центроид новостей, предфильтр отключен")
+            self.prefilter_enabled = False
+            return None
+
+        centroid = np.mean(np.asarray(vectors, dtype=np.float32), axis=0)
+        centroid /= np.linalg.norm(centroid) + 1e-12
+        self._news_centroid = centroid
+
+        try:
+            self.centroid_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self.centroid_cache_path.write_text(
+                json.dumps({"key": cache_key, "centroid": centroid.tolist()}),
+                encoding="utf-8"
+            )
+        except OSError as e:
+            logger.warning("[EDITORIAL] Не удалось сохранить центроид новостей: %s", e)
+
+        return centroid
+
+    def _news_similarity(self, title: str, content: str) -> Optional[float]:
+        """
+        Косинусная близость поста к центроиду эталонных новостей.
+
+        Args:
+            title: Заголовок поста
+            content: Текст поста
+
+        Returns:
+            Значение близости или None, если оценка недоступна
+        """
+        centroid = self._get_news_centroid()
+        if centroid is None:
+            return None
+
+        vector = self.ollama.get_embedding(f"{title} {content[:512]}")
+        if vector is None:
+            return None
+
+        return float(np.dot(centroid, vector) / (np.linalg.norm(vector) + 1e-12))
 
     def _clean_json_string(self, text: str) -> str:
         """
@@ -184,30 +300,16 @@ class EditorialService:
         Returns:
             Очищенная JSON строка
         """
-        text = text.strip()
-
-        # Удаляем markdown code blocks
-        if text.startswith('```'):
-            text = text.split('```')[1]
-            if text.startswith('json'):
-                text = text[4:]
-
-        # Ищем JSON между фигурными скобками
+        # Один проход find/rfind: markdown-обертка ```json ... ``` и пробелы
+        # по краям отбрасываются вместе с текстом вне фигурных скобок
         start = text.find('{')
         end = text.rfind('}')
 
-        if start == -1 or end == -1:
-            # Если скобки не найдены, пытаем извлечь весь текст как JSON
-            # Это сработает, если LLM вернул чистый JSON без markdown
-            try:
-                json.loads(text)  # Проверяем, является ли весь текст валидным JSON
-                return text
-            except:
-                # Если не JSON, пытаем найти границы
-                pass
+        if start == -1 or end < start:
+            # Скобки не найдены — возвращаем текст как есть, ошибку сообщит парсер
+            return text
 
-        # Если скобки найдены, возвращаем JSON между ними
-        return text[start:end+1]
+        return text[start:end + 1]
 
     def _validate_and_fix_response(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -297,7 +399,7 @@ class EditorialService:
             json_str = self._clean_json_string(response)
 
             # Парсинг JSON
-            result = json.loads(json_str)
+            result = json_utils.loads(json_str)
 
             if not isinstance(result, dict):
                 raise ValueError("JSON is not a dictionary")
@@ -313,7 +415,7 @@ class EditorialService:
                 # Замена одинарных кавычек на двойные
                 fixed_json = response.replace("'", '"').replace('\n', ' ')
                 fixed_json = self._clean_json_string(fixed_json)
-                result = json.loads(fixed_json)
+                result = json_utils.loads(fixed_json)
                 result = self._validate_and_fix_response(result)
                 return result
             except Exception:
@@ -356,43 +458,59 @@ class EditorialService:
                 'error': str | None
             }
         """
-        import time
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         # ДОБАВЛЕНО: Логирование входных данных
-        logger.info(f"[EDITORIAL] Начало обработки поста из {source}")
-        logger.debug(f"[EDITORIAL] Заголовок: {title[:100]}...")
-        logger.debug(f"[EDITORIAL] Контент: {content[:500]}...")
-        logger.debug(f"[EDITORIAL] Длина контента: {len(content)} символов")
-        logger.debug(f"[EDITORIAL] Default relevant: {default_relevant}")
-
-        # Подготовка входного текста
-        post_content = f"Заголовок: {title}\n\nТекст:\n{content}"
+        logger.info("[EDITORIAL] Начало обработки поста из %s", source)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[EDITORIAL] Заголовок: %s...", title[:100])
+            logger.debug("[EDITORIAL] Контент: %s...", content[:500])
+            logger.debug("[EDITORIAL] Длина контента: %d символов", len(content))
+            logger.debug("[EDITORIAL] Default relevant: %s", default_relevant)
 
         # Формирование промпта
-        user_prompt = f"""Обработай следующий технический пост:
-
-<<<
-{post_content}
->>>
-
-ВАЖНО: Верни ТОЛЬКО JSON без дополнительного текста.
-Все обязательные поля должны быть заполнены валидными значениями.
-"""
+        user_prompt = _EDITORIAL_USER_TEMPLATE.format(title=title, content=content)
 
         try:
-            # Генерация с повышенной температурой для креативности
-            logger.debug(f"[EDITORIAL] Отправка запроса к LLM модель: {self.model}")
-            response = self.ollama.generate(
-                prompt=user_prompt,
-                system=self.system_prompt,
+            # Дешевый предфильтр до вызова большой модели (не применяется к Habr)
+            if self.prefilter_enabled and not default_relevant:
+                similarity = self._news_similarity(title, content)
+                if similarity is not None and similarity < self.prefilter_threshold:
+                    logger.info(
+                        "[EDITORIAL] Пост отсеян предфильтром: сходство %.2f < %.2f",
+                        similarity, self.prefilter_threshold
+                    )
+                    return {
+                        'is_news': False,
+                        'original_summary': content[:500] + "..." if len(content) > 500 else content,
+                        'rewritten_post': None,
+                        'title': None,
+                        'teaser': None,
+                        'image_prompt': None,
+                        'relevance_score': 0.0,
+                        'relevance_reason': f"Отсеяно предфильтром: сходство с новостной тематикой {similarity:.2f}",
+                        'content_type': None,
+                        'processing_time': time.perf_counter() - start_time,
+                        'error': None
+                    }
+
+            # Генерация с повышенной температурой для креативности.
+            # Ответ читается потоком и обрывается сразу после закрытия JSON-объекта
+            logger.debug("[EDITORIAL] Отправка запроса к LLM модель: %s", self.model)
+            response = self.ollama.chat_stream_until_json(
+                messages=[
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
                 temperature=0.7,  # Повышено для креативной переработки
-                max_tokens=8000
+                max_tokens=8000,
+                model=self.model
             )
 
             # ДОБАВЛЕНО: Логирование ответа LLM
-            logger.debug(f"[EDITORIAL] Полный ответ LLM: {response[:1000] if response else 'EMPTY'}...")
-            logger.debug(f"[EDITORIAL] Длина ответа LLM: {len(response) if response else 0} символов")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[EDITORIAL] Полный ответ LLM: %s...", response[:1000] if response else 'EMPTY')
+                logger.debug("[EDITORIAL] Длина ответа LLM: %d символов", len(response) if response else 0)
 
             if not response:
                 # Для Habr все равно сохраняем с базовыми данными
@@ -407,7 +525,7 @@ class EditorialService:
                     'relevance_score': 0.8 if default_relevant else 0.0,
                     'relevance_reason': "LLM вернул пустой ответ" if not default_relevant else "Статья с Habr, сохранена по умолчанию",
                     'content_type': 'news',
-                    'processing_time': time.time() - start_time,
+                    'processing_time': time.perf_counter() - start_time,
                     'error': 'Empty response from LLM'
                 }
 
@@ -415,11 +533,11 @@ class EditorialService:
             result = self._parse_json_response(response)
 
             # ДОБАВЛЕНО: Логирование распарсенного результата
-            logger.debug(f"[EDITORIAL] Распарсенный результат: {result}")
+            logger.debug("[EDITORIAL] Распарсенный результат: %s", result)
 
             if result.get('error'):
                 # Для Habr все равно сохраняем с базовыми данными
-                logger.error(f"[EDITORIAL] Ошибка парсинга LLM ответа: {result['error']}")
+                logger.error("[EDITORIAL] Ошибка парсинга LLM ответа: %s", result['error'])
                 return {
                     'is_news': True if default_relevant else False,
                     'original_summary': content[:500] + "..." if len(content) > 500 else content,
@@ -430,7 +548,7 @@ class EditorialService:
                     'relevance_score': 0.8 if default_relevant else 0.0,
                     'relevance_reason': f"Ошибка парсинга: {result['error']}" if not default_relevant else "Статья с Habr, сохранена по умолчанию",
                     'content_type': 'news',
-                    'processing_time': time.time() - start_time,
+                    'processing_time': time.perf_counter() - start_time,
                     'error': result['error']
                 }
 
@@ -440,18 +558,19 @@ class EditorialService:
                 rewritten_len = len(result['rewritten_post'])
                 similarity = 1.0 - abs(original_len - rewritten_len) / max(original_len, rewritten_len, 1)
 
-                logger.debug(f"[EDITORIAL] Длина оригинала: {original_len} символов")
-                logger.debug(f"[EDITORIAL] Длина обработанного: {rewritten_len} символов")
-                logger.debug(f"[EDITORIAL] Сходство по длине: {similarity:.2f}")
+                logger.debug("[EDITORIAL] Длина оригинала: %d символов", original_len)
+                logger.debug("[EDITORIAL] Длина обработанного: %d символов", rewritten_len)
+                logger.debug("[EDITORIAL] Сходство по длине: %.2f", similarity)
 
                 if similarity > 0.9:  # Если тексты очень похожи по длине
                     logger.warning("[EDITORIAL] Обработанный текст слишком похож на оригинал!")
 
                 # ДОБАВЛЕНО: Логирование начала обработанного текста
-                logger.debug(f"[EDITORIAL] Начало обработанного текста: {result['rewritten_post'][:500]}...")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("[EDITORIAL] Начало обработанного текста: %s...", result['rewritten_post'][:500])
 
             # Добавляем метаданные
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
             result['processing_time'] = processing_time
             result['error'] = None
 
@@ -462,14 +581,14 @@ class EditorialService:
                 if result.get('relevance_score') < 0.8:
                     result['relevance_reason'] = f"Статья с Habr (оригинальная оценка: {result.get('relevance_score', 0.0):.2f})"
 
-            logger.info(f"[EDITORIAL] Обработка завершена за {processing_time:.2f}с")
-            logger.debug(f"[EDITORIAL] Итоговый результат: {result}")
+            logger.info("[EDITORIAL] Обработка завершена за %.2fс", processing_time)
+            logger.debug("[EDITORIAL] Итоговый результат: %s", result)
 
             return result
 
         except Exception as e:
             # Даже при ошибке сохраняем Habr статьи
-            logger.error(f"[EDITORIAL] Критическая ошибка обработки: {e}")
+            logger.error("[EDITORIAL] Критическая ошибка обработки: %s", e)
             logger.exception("[EDITORIAL] Stack trace:")
             return {
                 'is_news': True if default_relevant else False,
@@ -481,7 +600,7 @@ class EditorialService:
                 'relevance_score': 0.8 if default_relevant else 0.0,
                 'relevance_reason': f"Критическая ошибка: {str(e)}" if not default_relevant else "Статья с Habr, сохранена несмотря на ошибку",
                 'content_type': 'news',
-                'processing_time': time.time() - start_time,
+                'processing_time': time.perf_counter() - start_time,
                 'error': str(e)
             }
 
@@ -496,46 +615,40 @@ class EditorialService:
         Returns:
             dict с форматированным контентом для Telegram
         """
-        import time
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         # ДОБАВЛЕНО: Логирование входных данных
-        logger.info(f"[EDITORIAL] Начало форматирования для Telegram")
-        logger.debug(f"[EDITORIAL] Заголовок: {title[:100]}...")
-        logger.debug(f"[EDITORIAL] Контент: {content[:500]}...")
-        logger.debug(f"[EDITORIAL] Длина контента: {len(content)} символов")
-
-        post_content = f"Заголовок: {title}\n\nТекст:\n{content}"
-
-        user_prompt = f"""Отформатируй следующую статью для Telegram:
+        logger.info("[EDITORIAL] Начало форматирования для Telegram")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[EDITORIAL] Заголовок: %s...", title[:100])
+            logger.debug("[EDITORIAL] Контент: %s...", content[:500])
+            logger.debug("[EDITORIAL] Длина контента: %d символов", len(content))
 
-<<<
-{post_content}
->>>
-
-ВАЖНО: Верни ТОЛЬКО JSON. Максимум 3500 символов."""
+        user_prompt = _TELEGRAM_USER_TEMPLATE.format(title=title, content=content)
 
         try:
             response = self.ollama.generate(
                 prompt=user_prompt,
                 system=self.telegram_system_prompt,
                 temperature=0.3,
-                max_tokens=4000
+                max_tokens=4000,
+                model=self.model
             )
 
             # ДОБАВЛЕНО: Логирование ответа LLM
-            logger.debug(f"[EDITORIAL] Ответ LLM для Telegram: {response[:1000] if response else 'EMPTY'}...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[EDITORIAL] Ответ LLM для Telegram: %s...", response[:1000] if response else 'EMPTY')
 
             if not response:
                 return {
                     'error': 'Empty response from LLM',
-                    'processing_time': time.time() - start_time
+                    'processing_time': time.perf_counter() - start_time
                 }
 
             result = self._parse_json_response(response)
 
             if result.get('error'):
-                return {**result, 'processing_time': time.time() - start_time}
+                return {**result, 'processing_time': time.perf_counter() - start_time}
 
             # Проверка обязательных полей
             required_fields = ['telegram_title', 'telegram_content', 'telegram_hashtags',
@@ -545,24 +658,24 @@ class EditorialService:
             if missing:
                 return {
                     'error': f'Missing fields: {missing}',
-                    'processing_time': time.time() - start_time
+                    'processing_time': time.perf_counter() - start_time
                 }
 
             # ДОБАВЛЕНО: Логирование результата
-            logger.debug(f"[EDITORIAL] Результат форматирования для Telegram: {result}")
+            logger.debug("[EDITORIAL] Результат форматирования для Telegram: %s", result)
 
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
             result['processing_time'] = processing_time
             result['error'] = None
 
             return result
 
         except Exception as e:
-            logger.error(f"[EDITORIAL] Ошибка форматирования для Telegram: {e}")
+            logger.error("[EDITORIAL] Ошибка форматирования для Telegram: %s", e)
             logger.exception("[EDITORIAL] Stack trace:")
             return {
                 'error': str(e),
-                'processing_time': time.time() - start_time
+                'processing_time': time.perf_counter() - start_time
             }
 
 
@@ -0,0 +1,150 @@
+"""Локальный классификатор тональности на ONNX Runtime (без вызова LLM)."""
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, List, Tuple
+
+import numpy as np
+
+from src.utils import json_utils
+
+logger = logging.getLogger(__name__)
+
+# Каталог с model.onnx и файлами токенизатора (например, экспорт
+# cardiffnlp/twitter-roberta-base-sentiment с int8 квантизацией).
+# Если не задан, классификатор отключен.
+_SENTIMENT_ONNX_MODEL = os.getenv("SENTIMENT_ONNX_MODEL", "")
+# Минимальная уверенность; ниже — ответ LLM
+_SENTIMENT_LOCAL_THRESHOLD = float(os.getenv("SENTIMENT_LOCAL_THRESHOLD", "0.6"))
+
+# Порядок классов cardiffnlp/twitter-roberta-base-sentiment
+_DEFAULT_LABELS = ["negative", "neutral", "positive"]
+
+
+class LocalSentiment:
+    """
+    Классификатор positive/negative/neutral на небольшой модели.
+
+    onnxruntime и transformers — необязательные зависимости: модель и
+    токенизатор загружаются лениво при первом вызове, а при их отсутствии
+    классификатор отключается и predict возвращает None.
+    """
+
+    def __init__(self, model_dir: Optional[str] = None, threshold: float = _SENTIMENT_LOCAL_THRESHOLD):
+        """
+        Инициализация без загрузки модели.
+
+        Args:
+            model_dir: Каталог модели. Если None, из SENTIMENT_ONNX_MODEL env.
+            threshold: Минимальная вероятность класса для ответа.
+        """
+        model_dir = model_dir or _SENTIMENT_ONNX_MODEL
+        self.model_dir = Path(model_dir) if model_dir else None
+        self.threshold = threshold
+        self.enabled = self.model_dir is not None
+
+        self._session = None
+        self._tokenizer = None
+        self._input_names: List[str] = []
+        self._labels = _DEFAULT_LABELS
+        self._lock = threading.Lock()
+
+    def _load(self) -> bool:
+        """
+        Загрузка ONNX модели и токенизатора.
+
+        Returns:
+            True если классификатор готов к работе
+        """
+        if self._session is not None:
+            return True
+        if not self.enabled:
+            return False
+
+        with self._lock:
+            if self._session is not None:
+                return True
+            try:
+                import onnxruntime
+                from transformers import AutoTokenizer
+
+                self._tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+                session = onnxruntime.InferenceSession(
+                    str(self.model_dir / "model.onnx"),
+                    providers=["CPUExecutionProvider"]
+                )
+                self._input_names = [i.name for i in session.get_inputs()]
+                self._labels = self._read_labels()
+                self._session = session
+                logger.info(f"Локальный классификатор тональности загружен: {self.model_dir}")
+                return True
+            except ImportError as e:
+                logger.warning(f"Локальный классификатор тональности недоступен (нет зависимости): {e}")
+            except Exception as e:
+                logger.warning(f"Не удалось загрузить классификатор тональности {self.model_dir}: {e}")
+
+            self.enabled = False
+            return False
+
+    def _read_labels(self) -> List[str]:
+        """Имена классов из config.json модели, если они осмысленные."""
+        try:
+            config = json_utils.loads((self.model_dir / "config.json").read_bytes())
+            id2label = config["id2label"]
+            labels = [str(id2label[str(i)]).lower() for i in range(len(id2label))]
+        except (OSError, ValueError, KeyError):
+            return _DEFAULT_LABELS
+
+        # У части экспортов метки вида LABEL_0 — тогда порядок по умолчанию
+        if set(labels) == set(_DEFAULT_LABELS):
+            return labels
+        return _DEFAULT_LABELS
+
+    def predict(self, text: str) -> Optional[Tuple[str, float]]:
+        """
+        Классификация тональности текста.
+
+        Args:
+            text: Входной текст.
+
+        Returns:
+            (метка, вероятность) или None, если классификатор недоступен,
+            уверенность ниже порога или инференс завершился ошибкой.
+        """
+        if not self._load():
+            return None
+
+        try:
+            encoded = self._tokenizer(text, truncation=True, max_length=512, return_tensors="np")
+            inputs = {name: encoded[name].astype(np.int64) for name in self._input_names if name in encoded}
+            logits = self._session.run(None, inputs)[0][0]
+        except Exception as e:
+            # Ответ даст LLM
+            logger.warning(f"Ошибка локального классификатора тональности: {e}")
+            return None
+
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+
+        best = int(probs.argmax())
+        confidence = float(probs[best])
+        if confidence < self.threshold:
+            return None
+        return self._labels[best], confidence
+
+
+_local_sentiment: Optional[LocalSentiment] = None
+
+
+def get_local_sentiment() -> LocalSentiment:
+    """
+    Получение singleton экземпляра классификатора.
+
+    Returns:
+        Экземпляр LocalSentiment
+    """
+    global _local_sentiment
+    if _local_sentiment is None:
+        _local_sentiment = LocalSentiment()
+    return _local_sentiment
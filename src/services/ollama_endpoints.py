@@ -0,0 +1,129 @@
+"""Пул Ollama endpoint'ов с оценкой здоровья и circuit breaker."""
+import time
+import random
+import logging
+import threading
+from typing import Dict, List, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Начальная оценка латентности endpoint'а в секундах
+_DEFAULT_LATENCY = 1.0
+
+
+class _EndpointStats:
+    """EWMA статистика одного endpoint'а."""
+
+    __slots__ = ("latency", "success", "resume_at")
+
+    def __init__(self):
+        # Латентность по видам запросов (путь API): embedding и генерация
+        # различаются на порядки и не должны усредняться вместе
+        self.latency: Dict[str, float] = {}
+        # Начальная успешность 100%
+        self.success = 1.0
+        # Момент (time.monotonic), до которого endpoint в карантине
+        self.resume_at = 0.0
+
+
+class OllamaEndpointPool:
+    """
+    Набор Ollama серверов (например, по одному на GPU) с выбором по здоровью.
+
+    Endpoint выбирается случайно с весом success / latency, где обе величины
+    сглажены EWMA по недавним запросам, а латентность учитывается отдельно
+    для каждого вида запроса: быстрые и надежные серверы получают
+    больше запросов, но медленные не выпадают из ротации полностью.
+    После ошибки endpoint уходит в карантин на backoff_secs и пропускается,
+    пока остальные доступны.
+    """
+
+    def __init__(self, urls: Iterable[str], backoff_secs: float = 30.0, alpha: float = 0.2):
+        """
+        Инициализация пула.
+
+        Args:
+            urls: Базовые URL Ollama API.
+            backoff_secs: Длительность карантина после ошибки в секундах.
+            alpha: Коэффициент сглаживания EWMA.
+
+        Raises:
+            ValueError: Если не передан ни один URL.
+        """
+        self.urls: List[str] = [url.strip().rstrip("/") for url in urls if url and url.strip()]
+        if not self.urls:
+            raise ValueError("Не задан ни один Ollama endpoint")
+
+        self.backoff_secs = backoff_secs
+        self.alpha = alpha
+        self._stats = {url: _EndpointStats() for url in self.urls}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def next_endpoint(self, exclude: Iterable[str] = (), kind: str = "") -> Optional[str]:
+        """
+        Выбор endpoint'а для следующего запроса.
+
+        Args:
+            exclude: Endpoint'ы, уже опробованные в текущем запросе.
+            kind: Вид запроса (путь API), по латентности которого выбирать.
+
+        Returns:
+            URL endpoint'а или None, если все исключены.
+        """
+        if len(self.urls) == 1:
+            return None if self.urls[0] in exclude else self.urls[0]
+
+        now = time.monotonic()
+        with self._lock:
+            candidates = [url for url in self.urls if url not in exclude]
+            if not candidates:
+                return None
+
+            healthy = [url for url in candidates if self._stats[url].resume_at <= now]
+            if not healthy:
+                # Все в карантине: пробуем тот, что освободится раньше всех
+                return min(candidates, key=lambda url: self._stats[url].resume_at)
+
+            weights = [
+                max(self._stats[url].success, 0.01)
+                / max(self._stats[url].latency.get(kind, _DEFAULT_LATENCY), 0.001)
+                for url in healthy
+            ]
+            return random.choices(healthy, weights=weights)[0]
+
+    def record_success(self, url: str, latency: Optional[float] = None, kind: str = "") -> None:
+        """
+        Учет успешного запроса.
+
+        Args:
+            url: Endpoint.
+            latency: Полное время ответа в секундах. None, если оно неизвестно
+                (например, для потоковых ответов замерено только время до
+                заголовков) — тогда обновляется только успешность.
+            kind: Вид запроса (путь API).
+        """
+        with self._lock:
+            stats = self._stats[url]
+            if latency is not None:
+                current = stats.latency.get(kind, _DEFAULT_LATENCY)
+                stats.latency[kind] = current + self.alpha * (latency - current)
+            stats.success += self.alpha * (1.0 - stats.success)
+            stats.resume_at = 0.0
+
+    def record_failure(self, url: str) -> None:
+        """
+        Учет ошибки: снижение оценки и карантин endpoint'а.
+
+        Args:
+            url: Endpoint.
+        """
+        with self._lock:
+            stats = self._stats[url]
+            stats.success -= self.alpha * stats.success
+            stats.resume_at = time.monotonic() + self.backoff_secs
+
+        if len(self.urls) > 1:
+            logger.warning(f"Ollama endpoint {url} в карантине на {self.backoff_secs:.0f}с")
@@ -1,13 +1,159 @@
 """Сервис для работы с Ollama LLM с учетом ограничений токенов."""
 import os
+import gzip
+import time
+import sqlite3
 import logging
-from typing import Optional, List, Dict, Any, Tuple
+import functools
+import threading
+from typing import Optional, List, Dict, Any, Tuple, Iterator, Callable
+import numpy as np
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from src.utils import json_utils
+from src.utils.disk_cache import DiskCache
+from src.services.ollama_endpoints import OllamaEndpointPool
+from src.services.local_sentiment import get_local_sentiment
+
 logger = logging.getLogger(__name__)
 
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_GZIP_JSON_HEADERS = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+
+# Настройки окружения читаются один раз при импорте модуля
+_OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
+# Несколько Ollama серверов через запятую (например, по одному на GPU).
+# Если не задано, используется только OLLAMA_BASE_URL.
+_OLLAMA_BASE_URLS = [url for url in os.getenv("OLLAMA_BASE_URLS", "").split(",") if url.strip()]
+# Время карантина endpoint'а после ошибки
+_OLLAMA_ENDPOINT_BACKOFF = float(os.getenv("OLLAMA_ENDPOINT_BACKOFF", "30"))
+_OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gpt-oss:20b")
+_EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+_OLLAMA_CLIENT_KEEP_ALIVE = os.getenv("OLLAMA_CLIENT_KEEP_ALIVE")
+# Размер контекста (0 — лимит модели из model_token_limits), размер батча prefill
+# и число потоков CPU (0 — автоопределение на стороне Ollama)
+_OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "0"))
+_OLLAMA_NUM_BATCH = int(os.getenv("OLLAMA_NUM_BATCH", "1024"))
+_OLLAMA_NUM_THREAD = int(os.getenv("OLLAMA_NUM_THREAD", "0"))
+# Размер in-process LRU кэша embeddings
+_EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+# Время жизни записи кэша ответов LLM
+_LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# Точный кэш ответов generate в SQLite, переживает перезапуск контейнера
+_LLM_DISK_CACHE = os.getenv("LLM_DISK_CACHE", "true").lower() == "true"
+_LLM_DISK_CACHE_PATH = os.getenv(
+    "LLM_DISK_CACHE_PATH",
+    os.path.join(os.getenv("APP_DATA_DIR", "/app/data"), "llm_cache.sqlite3")
+)
+# Сжатие тел запросов gzip. Сам Ollama не распаковывает Content-Encoding
+# запроса, поэтому включать только за прокси, который это делает.
+_OLLAMA_GZIP_REQUESTS = os.getenv("OLLAMA_GZIP_REQUESTS", "false").lower() == "true"
+_OLLAMA_GZIP_MIN_BYTES = int(os.getenv("OLLAMA_GZIP_MIN_BYTES", "8192"))
+
+# HTTP статусы, при которых запрос повторяется, а endpoint считается сбойным
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Общая стратегия повторов для всех экземпляров OllamaService (Retry неизменяем)
+_DEFAULT_MAX_RETRIES = 3
+_RETRY = Retry(
+    total=_DEFAULT_MAX_RETRIES,
+    backoff_factor=1,
+    status_forcelist=sorted(_RETRY_STATUSES),
+    allowed_methods=["POST"]
+)
+# Размер пула соединений: под ожидаемое число параллельных запросов к Ollama
+_OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "32"))
+
+# Пути Ollama API, полные URL собираются один раз на endpoint
+_API_PATHS = ("/api/generate", "/api/chat", "/api/embed", "/api/tags")
+
+
+def _encode_body(payload: Dict[str, Any]) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Сериализация тела запроса с опциональным gzip сжатием.
+
+    Args:
+        payload: Тело запроса
+
+    Returns:
+        Кортеж (тело, заголовки)
+    """
+    body = json_utils.dumps(payload)
+    if _OLLAMA_GZIP_REQUESTS and len(body) >= _OLLAMA_GZIP_MIN_BYTES:
+        # Уровень 1: сжатие текста в разы при пренебрежимой нагрузке на CPU
+        return gzip.compress(body, compresslevel=1), _GZIP_JSON_HEADERS
+    return body, _JSON_HEADERS
+
+
+# Токенизатор tiktoken загружается лениво при первой обрезке текста.
+# False означает, что tiktoken недоступен и используется эвристика по символам.
+_tokenizer = None
+
+
+def _get_tokenizer():
+    """
+    Получение токенизатора cl100k_base.
+
+    Returns:
+        Экземпляр tiktoken.Encoding или None, если tiktoken недоступен
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            import tiktoken
+            _tokenizer = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken недоступен, используется оценка по символам: {e}")
+            _tokenizer = False
+    return _tokenizer or None
+
+
+class _JsonObjectScanner:
+    """
+    Инкрементальный счетчик вложенности фигурных скобок JSON.
+
+    Учитывает строковые литералы и escape-последовательности, чтобы скобки
+    внутри текста не сбивали подсчет.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> int:
+        """
+        Обрабатывает очередной фрагмент текста.
+
+        Args:
+            text: Фрагмент ответа модели
+
+        Returns:
+            Индекс закрывающей скобки объекта верхнего уровня во фрагменте или -1
+        """
+        for i, char in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                if self.started:
+                    self.in_string = True
+            elif char == '{':
+                self.depth += 1
+                self.started = True
+            elif char == '}' and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return i
+        return -1
+
 
 class OllamaService:
     """
@@ -22,12 +168,22 @@ class OllamaService:
     - анализа тональности
     """
 
+    # Безопасная длина текста для embedding модели
+    EMBED_MAX_CHARS = 2000
+
+    # Системные промпты вспомогательных задач
+    _SUMMARY_SYSTEM = "Ты помощник для создания кратких саммари. Выводи только саммари без вступлений."
+    _KEYWORDS_SYSTEM = "Ты помощник для извлечения ключевых слов. Выводи только слова через запятую."
+    _SENTIMENT_SYSTEM = "Ты классификатор тональности. Отвечай только одним словом: positive, negative или neutral."
+    _SENTIMENT_LABELS = frozenset({"positive", "negative", "neutral"})
+
     def __init__(
             self,
             base_url: Optional[str] = None,
             model: Optional[str] = None,
             timeout: int = 600,
-            max_retries: int = 3
+            max_retries: int = _DEFAULT_MAX_RETRIES,
+            base_urls: Optional[List[str]] = None
     ):
         """
         Инициализация Ollama сервиса.
@@ -37,10 +193,26 @@ class OllamaService:
             model: Название модели для генерации текста. Если None, из env.
             timeout: Таймаут запроса в секундах.
             max_retries: Количество попыток при ошибке.
+            base_urls: Несколько URL Ollama API для распределения нагрузки.
+                Если None, берется из OLLAMA_BASE_URLS env, иначе используется base_url.
         """
-        self.base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
-        self.model = model or os.getenv("OLLAMA_MODEL", "gpt-oss:20b")
+        urls = base_urls or (_OLLAMA_BASE_URLS if base_url is None else None) or [base_url or _OLLAMA_BASE_URL]
+        self._endpoints = OllamaEndpointPool(urls, backoff_secs=_OLLAMA_ENDPOINT_BACKOFF)
+        # Основной endpoint (для логов и обратной совместимости)
+        self.base_url = self._endpoints.urls[0]
+        # Готовые URL методов API по endpoint'ам
+        self._api_urls = {
+            url: {path: f"{url}{path}" for path in _API_PATHS}
+            for url in self._endpoints.urls
+        }
+        self.model = model or _OLLAMA_MODEL
+        self.embedding_model = _EMBEDDING_MODEL
         self.timeout = timeout
+        self.max_retries = max_retries
+
+        # Время удержания модели в памяти Ollama между запросами (например, "1h").
+        # Если не задано, действует серверная настройка OLLAMA_KEEP_ALIVE.
+        self.keep_alive = _OLLAMA_CLIENT_KEEP_ALIVE
 
         # Устанавливаем лимит токенов для разных моделей
         self.model_token_limits = {
@@ -57,19 +229,38 @@ class OllamaService:
         self.response_tokens = int(self.max_tokens * 0.25)
         self.input_tokens_limit = self.max_tokens - self.response_tokens
 
-        # Настройка HTTP сессии с автоматическими повторами
+        # Настройка HTTP сессии с автоматическими повторами.
+        # Адаптер (пул соединений) свой у каждой сессии, Retry общий
         self.session = requests.Session()
-        retry_strategy = Retry(
-            total=max_retries,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["POST"]
+        adapter = HTTPAdapter(
+            pool_connections=_OLLAMA_POOL_SIZE,
+            pool_maxsize=_OLLAMA_POOL_SIZE,
+            max_retries=_RETRY if max_retries == _DEFAULT_MAX_RETRIES else _RETRY.new(total=max_retries)
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
 
-        logger.info(f"Ollama сервис инициализирован: {self.base_url}, модель: {self.model}, лимит токенов: {self.max_tokens}")
+        # Держим TCP соединения открытыми между запросами
+        self.session.headers.update({
+            "Connection": "keep-alive",
+            "Keep-Alive": "timeout=75, max=1000"
+        })
+
+        # Неизменяемая часть тела запроса по моделям (model, keep_alive, options)
+        self._base_payloads: Dict[str, Dict[str, Any]] = {}
+
+        # LRU кэш embeddings по (текст, модель): повторные тексты не уходят в Ollama
+        self._cached_embedding = functools.lru_cache(maxsize=_EMBEDDING_CACHE_SIZE)(self._embed_uncached)
+
+        # Дисковый кэш точных совпадений открывается лениво
+        self._disk_cache: Optional[DiskCache] = None
+        self._disk_cache_enabled = _LLM_DISK_CACHE
+
+        # Модели, прогрев которых уже запущен в фоне
+        self._warmup_started: set = set()
+        self._warmup_lock = threading.Lock()
+
+        logger.info(f"Ollama сервис инициализирован: {', '.join(self._endpoints.urls)}, модель: {self.model}, лимит токенов: {self.max_tokens}")
 
     def _estimate_tokens(self, text: str) -> int:
         """
@@ -92,6 +283,9 @@ class OllamaService:
         """
         Обрезает текст до указанного количества токенов.
 
+        Текст кодируется tiktoken один раз, список токенов обрезается и
+        декодируется обратно. Без tiktoken используется оценка по символам.
+
         Args:
             text: Исходный текст
             max_tokens: Максимальное количество токенов
@@ -102,6 +296,13 @@ class OllamaService:
         if not text:
             return text
 
+        tokenizer = _get_tokenizer()
+        if tokenizer is not None:
+            token_ids = tokenizer.encode(text, disallowed_special=())
+            if len(token_ids) <= max_tokens:
+                return text
+            return tokenizer.decode(token_ids[:max_tokens]) + "... [текст обрезан]"
+
         # Примерное соотношение для русского языка
         max_chars = max_tokens * 4
 
@@ -185,26 +386,297 @@ class OllamaService:
 
         return prepared_messages, was_truncated
 
-    def health_check(self) -> bool:
+    def _base_payload(self, model: str) -> Dict[str, Any]:
+        """
+        Неизменяемая часть тела запроса для модели, вычисляется один раз.
+
+        num_ctx задается явно, чтобы Ollama не обрезал промпт до своего
+        контекста по умолчанию (2048), а num_batch ускоряет prefill.
+
+        Args:
+            model: Модель запроса
+
+        Returns:
+            Шаблон тела запроса; вызывающий код копирует его, а не изменяет
+        """
+        base = self._base_payloads.get(model)
+        if base is None:
+            options = {
+                "num_ctx": _OLLAMA_NUM_CTX or self.model_token_limits.get(model, 8192),
+                "num_batch": _OLLAMA_NUM_BATCH
+            }
+            if _OLLAMA_NUM_THREAD:
+                options["num_thread"] = _OLLAMA_NUM_THREAD
+
+            base = {"model": model, "options": options}
+            if self.keep_alive:
+                base["keep_alive"] = self.keep_alive
+            self._base_payloads[model] = base
+        return base
+
+    def _build_options(self, model: str, **options) -> Dict[str, Any]:
+        """
+        Формирует options запроса с параметрами контекста и батча.
+
+        Args:
+            model: Модель запроса
+            **options: Параметры запроса (temperature, num_predict)
+
+        Returns:
+            Словарь options для Ollama API
+        """
+        return {**self._base_payload(model)["options"], **options}
+
+    def _payload(self, model: str, **fields) -> Dict[str, Any]:
+        """
+        Копия шаблона тела запроса с полями конкретного вызова.
+
+        Args:
+            model: Модель запроса
+            **fields: Поля запроса (messages/prompt, stream)
+
+        Returns:
+            Тело запроса без options
+        """
+        payload = dict(self._base_payload(model))
+        payload.update(fields)
+        return payload
+
+    def _chat_payload(
+            self,
+            messages: List[Dict[str, str]],
+            temperature: float,
+            max_tokens: Optional[int],
+            model: str,
+            stream: bool
+    ) -> Dict[str, Any]:
+        """
+        Формирует тело запроса к /api/chat с обрезкой сообщений под лимит.
+
+        Args:
+            messages: Список сообщений
+            temperature: Температура сэмплирования
+            max_tokens: Максимальное количество токенов ответа
+            model: Модель запроса
+            stream: Потоковый режим
+
+        Returns:
+            Тело запроса
+        """
+        # Проверяем и обрезаем сообщения при необходимости
+        prepared_messages, was_truncated = self._prepare_messages(messages)
+
+        if was_truncated:
+            logger.warning(f"Промпт был обрезан для модели {model} с лимитом {self.max_tokens} токенов")
+
+        payload = self._payload(model, messages=prepared_messages, stream=stream)
+        payload["options"] = self._build_options(
+            model,
+            temperature=temperature,
+            num_predict=max_tokens or self.response_tokens
+        )
+        return payload
+
+    def _generate_payload(
+            self,
+            prompt: str,
+            temperature: float,
+            max_tokens: Optional[int],
+            model: str,
+            stream: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Формирует тело запроса к /api/generate с обрезкой промпта под лимит.
+
+        Args:
+            prompt: Пользовательский промт
+            temperature: Температура сэмплирования
+            max_tokens: Максимальное количество токенов ответа
+            model: Модель запроса
+            stream: Потоковый режим
+
+        Returns:
+            Тело запроса
+        """
+        # Проверяем и обрезаем промпт при необходимости
+        prompt_tokens = self._estimate_tokens(prompt)
+        if prompt_tokens > self.input_tokens_limit:
+            prompt = self._truncate_text(prompt, self.input_tokens_limit)
+            logger.warning(f"Промпт обрезан с {prompt_tokens} до {self._estimate_tokens(prompt)} токенов")
+
+        payload = self._payload(model, prompt=prompt, stream=stream)
+        payload["options"] = self._build_options(
+            model,
+            temperature=temperature,
+            num_predict=max_tokens or self.response_tokens
+        )
+        return payload
+
+    def _prepare_embedding_texts(self, texts: List[str]) -> List[str]:
+        """
+        Обрезает тексты для embedding до безопасной длины.
+
+        Args:
+            texts: Исходные тексты
+
+        Returns:
+            Подготовленные тексты
+        """
+        prepared = []
+        for text in texts:
+            if len(text) > self.EMBED_MAX_CHARS:
+                logger.warning(
+                    f"Текст для эмбеддинга слишком длинный ({len(text)} символов). "
+                    f"Он будет обрезан до {self.EMBED_MAX_CHARS} символов."
+                )
+                text = text[:self.EMBED_MAX_CHARS]
+            prepared.append(text)
+        return prepared
+
+    def _post_json(
+            self,
+            path: str,
+            payload: Dict[str, Any],
+            endpoint: Optional[str] = None,
+            **kwargs
+    ) -> requests.Response:
+        """
+        POST-запрос с JSON телом, сериализованным через orjson (json_utils).
+
+        Крупные тела сжимаются gzip, если включен OLLAMA_GZIP_REQUESTS.
+        Endpoint выбирается из пула по здоровью; при сетевой ошибке или
+        ответе 429/5xx он уходит в карантин, а запрос повторяется на следующем
+        доступном endpoint'е. Латентность учитывается по пути API и только
+        для непотоковых запросов.
+
+        Args:
+            path: Путь API, например "/api/chat"
+            payload: Тело запроса
+            endpoint: Конкретный endpoint без перебора. Если None, выбирается из пула.
+            **kwargs: Дополнительные параметры requests (timeout, stream)
+
+        Returns:
+            Ответ сервера (с 429/5xx, если так ответили все endpoint'ы)
+
+        Raises:
+            requests.RequestException: Если запрос не удался на всех endpoint'ах
+        """
+        body, headers = _encode_body(payload)
+        tried = []
+
+        while True:
+            url = endpoint or self._endpoints.next_endpoint(exclude=tried, kind=path)
+            tried.append(url)
+            start = time.perf_counter()
+            try:
+                response = self.session.post(self._api_urls[url][path], data=body, headers=headers, **kwargs)
+            except requests.RequestException:
+                self._endpoints.record_failure(url)
+                if endpoint or len(tried) >= len(self._endpoints):
+                    raise
+                logger.debug("Повтор %s на другом endpoint'е после ошибки %s", path, url)
+                continue
+
+            if response.status_code in _RETRY_STATUSES:
+                self._endpoints.record_failure(url)
+                if endpoint or len(tried) >= len(self._endpoints):
+                    return response
+                response.close()
+                logger.debug("Повтор %s на другом endpoint'е после HTTP %s от %s", path, response.status_code, url)
+                continue
+
+            # У потокового ответа замерено только время до заголовков
+            latency = None if kwargs.get("stream") else time.perf_counter() - start
+            self._endpoints.record_success(url, latency, kind=path)
+            return response
+
+    def health_check(self, record_failures: bool = True) -> bool:
         """
         Проверка доступности Ollama сервиса.
 
+        Args:
+            record_failures: Отправлять недоступные endpoint'ы в карантин.
+
         Returns:
-            True если сервис доступен, False иначе.
+            True если доступен хотя бы один endpoint, False иначе.
         """
-        try:
-            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
-            return response.status_code == 200
-        except requests.RequestException as e:
-            logger.error(f"Ollama health check failed: {e}")
-            return False
+        healthy = False
+        for url in self._endpoints.urls:
+            try:
+                response = self.session.get(self._api_urls[url]["/api/tags"], timeout=5)
+                if response.status_code == 200:
+                    healthy = True
+                elif record_failures:
+                    self._endpoints.record_failure(url)
+            except requests.RequestException as e:
+                logger.error(f"Ollama health check failed ({url}): {e}")
+                if record_failures:
+                    self._endpoints.record_failure(url)
+        return healthy
+
+    def warmup(self, model: Optional[str] = None) -> bool:
+        """
+        Предварительная загрузка модели в память Ollama.
+
+        Отправляет пустой запрос к /api/generate на каждый endpoint, чтобы
+        модель была загружена в VRAM до первого реального запроса и он не ждал
+        холодного старта.
+
+        Args:
+            model: Название модели. Если None, используется модель сервиса.
+
+        Returns:
+            True если модель загружена хотя бы на одном endpoint'е, False иначе.
+        """
+        model = model or self.model
+
+        # Те же num_ctx/num_batch, что и в рабочих запросах: при других
+        # значениях Ollama перезагрузил бы модель на первом запросе
+        payload = self._payload(model, prompt="")
+        payload["options"] = self._build_options(model, num_predict=1)
+
+        loaded = False
+        for url in self._endpoints.urls:
+            try:
+                logger.info(f"Прогрев модели {model} на {url}...")
+                response = self._post_json("/api/generate", payload, endpoint=url, timeout=self.timeout)
+                response.raise_for_status()
+                logger.info(f"Модель {model} загружена на {url}")
+                loaded = True
+            except requests.RequestException as e:
+                logger.warning(f"Не удалось прогреть модель {model} на {url}: {e}")
+        return loaded
+
+    def warmup_in_background(self, model: Optional[str] = None) -> None:
+        """
+        Прогрев модели в фоновом потоке, не более одного раза на модель.
+
+        Вызывающий код не ждет холодной загрузки модели (для больших моделей
+        это десятки секунд).
+
+        Args:
+            model: Название модели. Если None, используется модель сервиса.
+        """
+        model = model or self.model
+        with self._warmup_lock:
+            if model in self._warmup_started:
+                return
+            self._warmup_started.add(model)
+
+        threading.Thread(
+            target=self.warmup,
+            args=(model,),
+            name=f"ollama-warmup-{model}",
+            daemon=True
+        ).start()
 
     def chat(
             self,
             messages: List[Dict[str, str]],
             temperature: float = 0.7,
             max_tokens: Optional[int] = None,
-            stream: bool = False
+            stream: bool = False,
+            model: Optional[str] = None
     ) -> Optional[str]:
         """
         Чат-режим с поддержкой system prompts через /api/chat.
@@ -213,43 +685,27 @@ class OllamaService:
             messages: Список сообщений в формате [{"role": "system/user/assistant", "content": "..."}]
             temperature: Температура сэмплирования (0.0 - детерминировано, 1.0 - креативно).
             max_tokens: Максимальное количество токенов для генерации.
-            stream: Потоковая генерация (не реализована).
+            stream: Читать ответ потоком по мере генерации (результат тот же).
+            model: Модель для этого запроса. Если None, используется модель сервиса.
 
         Returns:
             Сгенерированный текст или None при ошибке.
         """
         if stream:
-            raise NotImplementedError("Потоковая генерация не реализована")
+            return self._join_stream(self.stream_chat(messages, temperature, max_tokens, model))
 
-        # Проверяем и обрезаем сообщения при необходимости
-        prepared_messages, was_truncated = self._prepare_messages(messages)
-
-        if was_truncated:
-            logger.warning(f"Промпт был обрезан для модели {self.model} с лимитом {self.max_tokens} токенов")
-
-        payload = {
-            "model": self.model,
-            "messages": prepared_messages,
-            "stream": False,
-            "options": {
-                "temperature": temperature
-            }
-        }
-
-        # Устанавливаем лимит токенов для ответа
-        response_max_tokens = max_tokens or self.response_tokens
-        payload["options"]["num_predict"] = response_max_tokens
+        payload = self._chat_payload(messages, temperature, max_tokens, model or self.model, stream=False)
 
         try:
-            logger.debug(f"Отправка chat запроса к {self.base_url}/api/chat")
-            response = self.session.post(
-                f"{self.base_url}/api/chat",
-                json=payload,
+            logger.debug("Отправка chat запроса к /api/chat")
+            response = self._post_json(
+                "/api/chat",
+                payload,
                 timeout=self.timeout
             )
             response.raise_for_status()
 
-            data = response.json()
+            data = json_utils.loads(response.content)
 
             # В /api/chat ответ находится в message.content
             if "message" in data and "content" in data["message"]:
@@ -270,13 +726,175 @@ class OllamaService:
             logger.error(f"Invalid response format: {e}")
             return None
 
+    def _stream_chunks(self, path: str, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Потоковый запрос: разбор ответа Ollama построчно (NDJSON).
+
+        Соединение закрывается при завершении или закрытии итератора,
+        поэтому break у вызывающего обрывает генерацию.
+
+        Args:
+            path: Путь API ("/api/generate" или "/api/chat")
+            payload: Тело запроса со stream=True
+
+        Yields:
+            Распарсенные чанки ответа
+
+        Raises:
+            requests.RequestException: При сетевой ошибке
+            ValueError: При ошибке в потоке или неверном JSON
+        """
+        response = self._post_json(path, payload, timeout=self.timeout, stream=True)
+        response.raise_for_status()
+
+        with response:
+            for line in response.iter_lines(chunk_size=4096):
+                if not line:
+                    continue
+
+                chunk = json_utils.loads(line)
+                if "error" in chunk:
+                    raise ValueError(f"Ollama вернул ошибку в потоке: {chunk['error']}")
+
+                yield chunk
+
+                if chunk.get("done"):
+                    return
+
+    def stream_generate(
+            self,
+            prompt: str,
+            temperature: float = 0.7,
+            max_tokens: Optional[int] = None,
+            model: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Потоковая генерация через /api/generate: фрагменты текста по мере готовности.
+
+        Args:
+            prompt: Пользовательский промт.
+            temperature: Температура сэмплирования.
+            max_tokens: Максимальное количество токенов для генерации.
+            model: Модель для этого запроса. Если None, используется модель сервиса.
+
+        Yields:
+            Фрагменты ответа
+
+        Raises:
+            requests.RequestException: При сетевой ошибке
+            ValueError: При ошибке в потоке или неверном JSON
+        """
+        payload = self._generate_payload(prompt, temperature, max_tokens, model or self.model, stream=True)
+
+        logger.debug("Отправка потокового generate запроса к /api/generate")
+        for chunk in self._stream_chunks("/api/generate", payload):
+            delta = chunk.get("response")
+            if delta:
+                yield delta
+
+    def stream_chat(
+            self,
+            messages: List[Dict[str, str]],
+            temperature: float = 0.7,
+            max_tokens: Optional[int] = None,
+            model: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Потоковый чат через /api/chat: дельты message.content по мере генерации.
+
+        Args:
+            messages: Список сообщений в формате [{"role": "system/user/assistant", "content": "..."}]
+            temperature: Температура сэмплирования.
+            max_tokens: Максимальное количество токенов для генерации.
+            model: Модель для этого запроса. Если None, используется модель сервиса.
+
+        Yields:
+            Фрагменты ответа
+
+        Raises:
+            requests.RequestException: При сетевой ошибке
+            ValueError: При ошибке в потоке или неверном JSON
+        """
+        payload = self._chat_payload(messages, temperature, max_tokens, model or self.model, stream=True)
+
+        logger.debug("Отправка потокового chat запроса к /api/chat")
+        for chunk in self._stream_chunks("/api/chat", payload):
+            delta = chunk.get("message", {}).get("content")
+            if delta:
+                yield delta
+
+    def _join_stream(self, deltas: Iterator[str]) -> Optional[str]:
+        """
+        Сборка потока фрагментов в полный ответ с обработкой ошибок.
+
+        Args:
+            deltas: Итератор stream_generate или stream_chat
+
+        Returns:
+            Полный текст или None при ошибке
+        """
+        try:
+            return "".join(deltas).strip()
+        except requests.Timeout:
+            logger.error(f"Ollama request timeout after {self.timeout}s")
+            return None
+        except requests.RequestException as e:
+            logger.error(f"Ollama request failed: {e}")
+            if hasattr(e, 'response') and hasattr(e.response, 'text'):
+                logger.error(f"Response body: {e.response.text[:500]}")
+            return None
+        except (KeyError, ValueError) as e:
+            logger.error(f"Invalid response format: {e}")
+            return None
+
+    def chat_stream_until_json(
+            self,
+            messages: List[Dict[str, str]],
+            temperature: float = 0.7,
+            max_tokens: Optional[int] = None,
+            model: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Потоковый чат через /api/chat с остановкой на конце JSON-объекта.
+
+        Читает дельты message.content по мере генерации и закрывает соединение,
+        как только закрывается первый JSON-объект верхнего уровня, поэтому
+        хвостовые токены модели не ждутся и не передаются.
+
+        Args:
+            messages: Список сообщений в формате [{"role": "system/user/assistant", "content": "..."}]
+            temperature: Температура сэмплирования (0.0 - детерминировано, 1.0 - креативно).
+            max_tokens: Максимальное количество токенов для генерации.
+            model: Модель для этого запроса. Если None, используется модель сервиса.
+
+        Returns:
+            Текст ответа до закрывающей скобки включительно или None при ошибке.
+        """
+        def until_json() -> Iterator[str]:
+            scanner = _JsonObjectScanner()
+            deltas = self.stream_chat(messages, temperature, max_tokens, model)
+            try:
+                for delta in deltas:
+                    end = scanner.feed(delta)
+                    if end != -1:
+                        # Объект закрыт — обрываем поток, не дожидаясь хвоста генерации
+                        yield delta[:end + 1]
+                        logger.debug("JSON-объект получен полностью, поток прерван")
+                        return
+                    yield delta
+            finally:
+                deltas.close()
+
+        return self._join_stream(until_json())
+
     def generate(
             self,
             prompt: str,
             system: Optional[str] = None,
             temperature: float = 0.7,
             max_tokens: Optional[int] = None,
-            stream: bool = False
+            stream: bool = False,
+            model: Optional[str] = None
     ) -> Optional[str]:
         """
         Генерация текста через LLM.
@@ -289,52 +907,38 @@ class OllamaService:
             system: Системный промт (инструкция для модели).
             temperature: Температура сэмплирования (0.0 - детерминировано, 1.0 - креативно).
             max_tokens: Максимальное количество токенов для генерации.
-            stream: Потоковая генерация (не реализована).
+            stream: Читать ответ потоком по мере генерации (результат тот же).
+            model: Модель для этого запроса. Если None, используется модель сервиса.
 
         Returns:
             Сгенерированный текст или None при ошибке.
         """
+        model = model or self.model
+
         # Если есть system prompt, используем chat API
         if system:
             messages = [
                 {"role": "system", "content": system},
                 {"role": "user", "content": prompt}
             ]
-            return self.chat(messages, temperature, max_tokens, stream)
+            return self.chat(messages, temperature, max_tokens, stream, model)
 
         # Иначе используем generate API
         if stream:
-            raise NotImplementedError("Потоковая генерация не реализована")
-
-        # Проверяем и обрезаем промпт при необходимости
-        prompt_tokens = self._estimate_tokens(prompt)
-        if prompt_tokens > self.input_tokens_limit:
-            prompt = self._truncate_text(prompt, self.input_tokens_limit)
-            logger.warning(f"Промпт обрезан с {prompt_tokens} до {self._estimate_tokens(prompt)} токенов")
+            return self._join_stream(self.stream_generate(prompt, temperature, max_tokens, model))
 
-        payload = {
-            "model": self.model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": temperature
-            }
-        }
-
-        # Устанавливаем лимит токенов для ответа
-        response_max_tokens = max_tokens or self.response_tokens
-        payload["options"]["num_predict"] = response_max_tokens
+        payload = self._generate_payload(prompt, temperature, max_tokens, model)
 
         try:
-            logger.debug(f"Отправка generate запроса к {self.base_url}/api/generate")
-            response = self.session.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
+            logger.debug("Отправка generate запроса к /api/generate")
+            response = self._post_json(
+                "/api/generate",
+                payload,
                 timeout=self.timeout
             )
             response.raise_for_status()
 
-            data = response.json()
+            data = json_utils.loads(response.content)
             return data.get("response", "").strip()
 
         except requests.Timeout:
@@ -349,7 +953,73 @@ class OllamaService:
             logger.error(f"Invalid response format: {e}")
             return None
 
-    def get_embedding(self, text: str, model: Optional[str] = None) -> Optional[List[float]]:
+    def get_embeddings(
+            self,
+            texts: List[str],
+            model: Optional[str] = None,
+            batch_size: int = 64
+    ) -> Optional[List[List[float]]]:
+        """
+        Пакетная генерация embedding векторов через /api/embed.
+
+        Тексты отправляются пачками по batch_size в одном запросе на пачку,
+        что заменяет N отдельных HTTP запросов одним и позволяет Ollama
+        считать пачку за один проход модели.
+
+        Args:
+            texts: Список текстов для векторизации.
+            model: Название embedding модели. Если None, используется модель сервиса.
+            batch_size: Максимальное количество текстов в одном запросе.
+
+        Returns:
+            Список векторов в порядке входных текстов или None при ошибке.
+        """
+        embedding_model = model or self.embedding_model
+        prepared = self._prepare_embedding_texts(texts)
+        # Одинаковые тексты отправляются один раз
+        unique = list(dict.fromkeys(prepared))
+
+        embeddings: List[List[float]] = []
+
+        try:
+            for i in range(0, len(unique), batch_size):
+                chunk = unique[i:i + batch_size]
+                payload = {
+                    "model": embedding_model,
+                    "input": chunk
+                }
+
+                response = self._post_json(
+                    "/api/embed",
+                    payload,
+                    timeout=30 + len(chunk)
+                )
+                response.raise_for_status()
+
+                data = json_utils.loads(response.content)
+                chunk_embeddings = data.get("embeddings")
+
+                if not chunk_embeddings or len(chunk_embeddings) != len(chunk):
+                    logger.error("Ollama не вернул embeddings для всех текстов")
+                    return None
+
+                embeddings.extend(chunk_embeddings)
+
+            logger.debug("Получено %d embeddings", len(embeddings))
+            if len(unique) == len(prepared):
+                return embeddings
+
+            by_text = dict(zip(unique, embeddings))
+            return [by_text[text] for text in prepared]
+
+        except requests.RequestException as e:
+            logger.error(f"Ошибка получения embedding: {e}")
+            return None
+        except (KeyError, ValueError) as e:
+            logger.error(f"Неверный формат ответа embedding: {e}")
+            return None
+
+    def get_embedding(self, text: str, model: Optional[str] = None) -> Optional[np.ndarray]:
         """
         Генерация embedding вектора для текста.
 
@@ -358,100 +1028,230 @@ class OllamaService:
 
         Args:
             text: Входной текст для векторизации.
-            model: Название embedding модели. Если None, использует env или nomic-embed-text.
+            model: Название embedding модели. Если None, используется модель сервиса.
 
         Returns:
-            Список из 768 чисел (вектор) или None при ошибке.
+            Вектор float32 из 768 чисел (только для чтения, общий с кэшем) или None
+            при ошибке или пустом тексте.
         """
-        embedding_model = model or os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
-
-        # Устанавливаем безопасную длину текста
-        MAX_TEXT_LENGTH = 2000
+        # Пустой текст не отправляется в Ollama; остальной текст векторизуется
+        # как есть, чтобы векторы совпадали с уже сохраненными
+        if not text or not text.strip():
+            return None
 
-        if len(text) > MAX_TEXT_LENGTH:
+        if len(text) > self.EMBED_MAX_CHARS:
             logger.warning(
-                f"Текст для эмбеддинга слишком длинный ({len(text)} символов). "
-                f"Он будет обрезан до {MAX_TEXT_LENGTH} символов."
+                f"Текст для эмбеддинга слишком длинный ({len(text)} символов), "
+                f"обрезан до {self.EMBED_MAX_CHARS}; для полного покрытия разбейте текст на части"
             )
-            text = text[:MAX_TEXT_LENGTH]
+            text = text[:self.EMBED_MAX_CHARS]
+
+        try:
+            return self._cached_embedding(text, model or self.embedding_model)
+        except LookupError:
+            return None
 
-        payload = {
-            "model": embedding_model,
-            "prompt": text
+    def _embed_uncached(self, text: str, model: str) -> np.ndarray:
+        """
+        Запрос embedding в Ollama для LRU кэша.
+
+        Args:
+            text: Текст, уже обрезанный до EMBED_MAX_CHARS.
+            model: Название embedding модели.
+
+        Returns:
+            Вектор float32; массив помечен только для чтения, так как
+            один и тот же объект возвращается всем вызывающим из кэша.
+
+        Raises:
+            LookupError: Если embedding не получен (неудачи не кэшируются).
+        """
+        embeddings = self.get_embeddings([text], model)
+        if not embeddings:
+            raise LookupError("Ollama не вернул embedding")
+        vector = np.asarray(embeddings[0], dtype=np.float32)
+        vector.flags.writeable = False
+        return vector
+
+    def embedding_cache_stats(self) -> Dict[str, Any]:
+        """
+        Статистика LRU кэша embeddings.
+
+        Returns:
+            Словарь с hits, misses, maxsize, currsize и hit_rate.
+        """
+        info = self._cached_embedding.cache_info()
+        total = info.hits + info.misses
+        return {
+            **info._asdict(),
+            "hit_rate": info.hits / total if total else 0.0
         }
 
-        try:
-            response = self.session.post(
-                f"{self.base_url}/api/embeddings",
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
+    def _get_disk_cache(self) -> Optional[DiskCache]:
+        """
+        Ленивое открытие дискового кэша ответов.
 
-            data = response.json()
-            embedding = data.get("embedding")
+        Returns:
+            Экземпляр DiskCache или None, если кэш отключен или недоступен
+        """
+        if not self._disk_cache_enabled:
+            return None
 
-            if not embedding:
-                logger.error("Ollama не вернул embedding")
+        if self._disk_cache is None:
+            try:
+                self._disk_cache = DiskCache(_LLM_DISK_CACHE_PATH, ttl=_LLM_CACHE_TTL)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Дисковый кэш LLM отключен: {e}")
+                self._disk_cache_enabled = False
                 return None
 
-            logger.debug(f"Получен embedding размерности {len(embedding)}")
-            return embedding
+        return self._disk_cache
 
-        except requests.RequestException as e:
-            logger.error(f"Ошибка получения embedding: {e}")
-            return None
-        except (KeyError, ValueError) as e:
-            logger.error(f"Неверный формат ответа embedding: {e}")
+    def _disk_cache_key(
+            self,
+            model: str,
+            system: Optional[str],
+            prompt: str,
+            temperature: float,
+            max_tokens: Optional[int]
+    ) -> str:
+        """Ключ дискового кэша с полными options запроса (как в _chat_payload)."""
+        options = self._build_options(
+            model,
+            temperature=temperature,
+            num_predict=max_tokens or self.response_tokens
+        )
+        return DiskCache.make_key(model, system, prompt, options)
+
+    def _disk_cache_get(self, key: str) -> Optional[str]:
+        """Ответ из дискового кэша или None."""
+        cache = self._get_disk_cache()
+        if cache is None:
             return None
+        return cache.get(key)
 
-    def summarize(self, text: str, max_length: int = 200) -> Optional[str]:
+    def _disk_cache_set(self, key: str, model: str, response: str) -> None:
+        """Сохранение ответа в дисковый кэш."""
+        cache = self._get_disk_cache()
+        if cache is not None:
+            cache.set(key, model, response)
+
+    def _generate_cached(
+            self,
+            task: str,
+            prompt: str,
+            system: str,
+            bypass_cache: bool = False,
+            validate: Optional[Callable[[str], bool]] = None,
+            **kwargs
+    ) -> Optional[str]:
+        """
+        Генерация с дисковым кэшем ответов.
+
+        Ответ берется из кэша при точном совпадении модели, промптов и
+        параметров генерации; параметры задачи (count, max_length) входят в
+        промпт. При промахе ответ генерируется и сохраняется, если проходит
+        validate.
+
+        Args:
+            task: Имя задачи (summarize, extract_keywords, sentiment_analysis).
+            prompt: Пользовательский промт.
+            system: Системный промт.
+            bypass_cache: Не использовать кэш (для тестов и отладки).
+            validate: Проверка ответа перед сохранением в кэш; по умолчанию
+                сохраняется любой непустой ответ.
+            **kwargs: Параметры generate (temperature, max_tokens).
+
+        Returns:
+            Сгенерированный или закэшированный текст, None при ошибке.
+        """
+        if bypass_cache:
+            return self.generate(prompt, system=system, **kwargs)
+
+        disk_key = self._disk_cache_key(
+            self.model, system, prompt, kwargs.get("temperature", 0.7), kwargs.get("max_tokens")
+        )
+        cached = self._disk_cache_get(disk_key)
+        if cached is not None:
+            logger.debug("Кэш ответов LLM: попадание для %s", task)
+            return cached
+
+        result = self.generate(prompt, system=system, **kwargs)
+
+        if result and (validate(result) if validate is not None else result.strip()):
+            self._disk_cache_set(disk_key, self.model, result)
+
+        return result
+
+    def summarize(self, text: str, max_length: int = 200, bypass_cache: bool = False) -> Optional[str]:
         """
         Создание краткого содержания текста.
 
         Args:
             text: Входной текст для суммаризации.
             max_length: Примерная длина саммари в словах.
+            bypass_cache: Не использовать кэш ответов.
 
         Returns:
             Краткое содержание или None при ошибке.
         """
-        system = "Ты помощник для создания кратких саммари. Выводи только саммари без вступлений."
+        system = self._SUMMARY_SYSTEM
         prompt = f"Создай краткое содержание (~{max_length} слов) следующего текста:\n\n{text}"
 
         # Низкая температура для более детерминированного результата
-        return self.generate(prompt, system=system, temperature=0.3)
+        return self._generate_cached(
+            "summarize", prompt, system, bypass_cache,
+            temperature=0.3
+        )
 
-    def extract_keywords(self, text: str, count: int = 10) -> Optional[str]:
+    def extract_keywords(self, text: str, count: int = 10, bypass_cache: bool = False) -> Optional[str]:
         """
         Извлечение ключевых слов из текста.
 
         Args:
             text: Входной текст.
             count: Количество ключевых слов для извлечения.
+            bypass_cache: Не использовать кэш ответов.
 
         Returns:
             Ключевые слова через запятую или None при ошибке.
         """
-        system = "Ты помощник для извлечения ключевых слов. Выводи только слова через запятую."
+        system = self._KEYWORDS_SYSTEM
         prompt = f"Извлеки {count} самых важных ключевых слов из текста:\n\n{text}"
 
-        return self.generate(prompt, system=system, temperature=0.2, max_tokens=100)
+        return self._generate_cached(
+            "extract_keywords", prompt, system, bypass_cache,
+            validate=lambda r: any(k.strip() for k in r.split(",")),
+            temperature=0.2, max_tokens=100
+        )
 
-    def sentiment_analysis(self, text: str) -> Optional[str]:
+    def sentiment_analysis(self, text: str, bypass_cache: bool = False) -> Optional[str]:
         """
         Анализ тональности текста.
 
+        Сначала используется локальный классификатор (если настроен
+        SENTIMENT_ONNX_MODEL); LLM вызывается, только если он недоступен
+        или не уверен в ответе.
+
         Args:
             text: Входной текст.
+            bypass_cache: Не использовать кэш ответов.
 
         Returns:
             Одно из значений: "positive", "negative", "neutral" или None при ошибке.
         """
-        system = "Ты классификатор тональности. Отвечай только одним словом: positive, negative или neutral."
+        local = get_local_sentiment().predict(text)
+        if local is not None:
+            return local[0]
+
+        system = self._SENTIMENT_SYSTEM
         prompt = f"Определи тональность текста:\n\n{text}"
 
-        response = self.generate(prompt, system=system, temperature=0.1, max_tokens=10)
+        response = self._generate_cached(
+            "sentiment_analysis", prompt, system, bypass_cache,
+            validate=lambda r: r.lower().strip() in self._SENTIMENT_LABELS,
+            temperature=0.1, max_tokens=10
+        )
 
         if response:
             return response.lower().strip()
@@ -460,6 +1260,7 @@ class OllamaService:
 
 # Singleton pattern
 _ollama_instance: Optional[OllamaService] = None
+_ollama_lock = threading.Lock()
 
 
 def get_ollama_service() -> OllamaService:
@@ -470,6 +1271,15 @@ def get_ollama_service() -> OllamaService:
         Экземпляр OllamaService
     """
     global _ollama_instance
+    created = None
     if _ollama_instance is None:
-        _ollama_instance = OllamaService()
+        with _ollama_lock:
+            if _ollama_instance is None:
+                _ollama_instance = created = OllamaService()
+
+    if created is not None:
+        # GET /api/tags открывает первое соединение в пуле сессии,
+        # и первый реальный запрос не платит за TCP handshake. Проверка идет
+        # вне блокировки и без карантина: Ollama может еще стартовать
+        created.health_check(record_failures=False)
     return _ollama_instance
\ No newline at end of file
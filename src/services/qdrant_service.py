@@ -3,15 +3,181 @@
 """
 
 import os
+import time
+import hashlib
 import logging
+import functools
+import threading
 import uuid
-from typing import Optional, List, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple, Union, Hashable
 
+import numpy as np
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import (
+    Distance,
+    VectorParams,
+    OptimizersConfigDiff,
+    PointStruct,
+    Batch,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    QuantizationSearchParams,
+    PayloadSelectorInclude,
+    SearchRequest,
+)
+
+from src.utils import json_utils
+from src.utils.ids import random_uuid
+from src.services.ollama_service import get_ollama_service
 
 logger = logging.getLogger(__name__)
 
+# Хранить оригинальные float32 векторы на диске (квантованные остаются в RAM
+# и используются при обходе HNSW; с диска читаются только кандидаты для rescore)
+_VECTORS_ON_DISK = os.getenv("QDRANT_VECTORS_ON_DISK", "true").lower() == "true"
+# gRPC (protobuf) вместо HTTP+JSON для upsert/search
+_QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true"
+_QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+# Число шардов новых коллекций: на одном узле шарды ищутся параллельно.
+# 0 — настройка сервера (один шард); задавать явно для крупных коллекций
+_QDRANT_SHARDS = int(os.getenv("QDRANT_SHARDS", "0"))
+# Число сегментов на шард; 0 — автоматически по числу CPU сервера Qdrant
+_QDRANT_SEGMENTS = int(os.getenv("QDRANT_SEGMENTS", "0"))
+# Параллельные запросы search_batch при делении большой пачки на части
+_QDRANT_SEARCH_WORKERS = int(os.getenv("QDRANT_SEARCH_WORKERS", "4"))
+# Сколько последних upsert'ов с явным ID помнить для пропуска повторов
+_QDRANT_SEEN_CACHE_SIZE = int(os.getenv("QDRANT_SEEN_CACHE_SIZE", "100000"))
+# Локальный кэш search_similar по близости векторов запроса (0 — отключен):
+# размер, допуск по косинусному расстоянию и время жизни записи
+_QDRANT_SIM_CACHE_SIZE = int(os.getenv("QDRANT_SIM_CACHE_SIZE", "1024"))
+_QDRANT_SIM_CACHE_EPS = float(os.getenv("QDRANT_SIM_CACHE_EPS", "0.002"))
+_QDRANT_SIM_CACHE_TTL = float(os.getenv("QDRANT_SIM_CACHE_TTL", "300"))
+# Кэш поиска по тексту (embedding + search) по хешу нормализованного текста
+_QDRANT_TEXT_CACHE_SIZE = int(os.getenv("QDRANT_TEXT_CACHE_SIZE", "4096"))
+
+Vector = Union[List[float], np.ndarray]
+
+
+def _as_float32(vector: Vector) -> np.ndarray:
+    """Вектор как непрерывный float32 массив (без копии, если он уже такой)."""
+    return np.ascontiguousarray(vector, dtype=np.float32)
+
+
+def _normalized(vector: Vector) -> np.ndarray:
+    """
+    L2-нормированный float32 вектор.
+
+    Для нормированных векторов скалярное произведение равно косинусной
+    близости, поэтому коллекции используют Distance.DOT, и Qdrant не
+    нормирует запросы сам.
+    """
+    vector = _as_float32(vector)
+    return vector / (np.linalg.norm(vector) + 1e-12)
+
+
+def _to_list(vector: Vector) -> List[float]:
+    """Преобразовать вектор в список для моделей Qdrant (PointStruct, SearchRequest)."""
+    return _as_float32(vector).tolist()
+
+
+# Пространство имен для детерминированных ID точек (uuid5)
+NAMESPACE = uuid.UUID("6f9619ff-8b86-d011-b42d-00cf4fc964ff")
+
+
+def _id_from_payload(metadata: Dict[str, Any]) -> Optional[str]:
+    """
+    Детерминированный ID точки по URL или заголовку с датой публикации.
+
+    Повторное сохранение той же статьи перезаписывает точку, а не создает дубль.
+    Одного заголовка недостаточно: разные посты с одинаковым заголовком
+    без даты получили бы один ID и перезаписали бы друг друга.
+
+    Returns:
+        Строковый UUID или None, если в payload нет url и нет пары title + published
+    """
+    url = metadata.get("url")
+    if url:
+        return str(uuid.uuid5(NAMESPACE, url))
+
+    title = metadata.get("title")
+    published = metadata.get("published")
+    if title and published:
+        return str(uuid.uuid5(NAMESPACE, title + str(published)))
+
+    return None
+
+
+def _fingerprint(vector: Vector, metadata: Dict[str, Any]) -> bytes:
+    """Отпечаток точки (вектор + payload) для обнаружения повторного upsert."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(_as_float32(vector).tobytes())
+    digest.update(json_utils.dumps(metadata))
+    return digest.digest()
+
+
+class _SimilarityCache:
+    """
+    LRU кэш результатов поиска по близости вектора запроса (SIM-LRU).
+
+    Ключи — нормализованные float32 векторы в одной матрице, поэтому поиск
+    ключа — одно матрично-векторное умножение. Попадание: косинусная
+    близость к ключу не меньше 1 - eps при тех же параметрах поиска.
+    """
+
+    def __init__(self, maxsize: int, eps: float, ttl: float):
+        self.maxsize = maxsize
+        self.eps = eps
+        self.ttl = ttl
+        self._keys: Optional[np.ndarray] = None
+        self._expires = np.zeros(maxsize, dtype=np.float64)
+        # слот матрицы → (контекст поиска, результаты), в порядке LRU
+        self._entries: "OrderedDict[int, Tuple[Hashable, List[Dict[str, Any]]]]" = OrderedDict()
+        self._free = list(range(maxsize))
+        self._lock = threading.Lock()
+
+    def get(self, context: Hashable, query: np.ndarray) -> Optional[List[Dict[str, Any]]]:
+        """Результаты для близкого запроса с тем же контекстом или None."""
+        with self._lock:
+            if not self._entries:
+                return None
+
+            scores = self._keys @ query
+            now = time.monotonic()
+            for slot in np.flatnonzero(scores >= 1.0 - self.eps):
+                entry = self._entries.get(int(slot))
+                if entry is not None and entry[0] == context and self._expires[slot] > now:
+                    self._entries.move_to_end(int(slot))
+                    return [dict(hit) for hit in entry[1]]
+        return None
+
+    def put(self, context: Hashable, query: np.ndarray, results: List[Dict[str, Any]]) -> None:
+        """Сохранить результаты, вытесняя самую старую запись."""
+        with self._lock:
+            if self._keys is None:
+                self._keys = np.zeros((self.maxsize, query.shape[0]), dtype=np.float32)
+
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot, _ = self._entries.popitem(last=False)
+
+            self._keys[slot] = query
+            self._expires[slot] = time.monotonic() + self.ttl
+            self._entries[slot] = (context, results)
+
+    def invalidate(self, source: Optional[str] = None) -> None:
+        """Сбросить записи источника (после записи в коллекцию) или все."""
+        with self._lock:
+            for slot in [s for s, (context, _) in self._entries.items() if source is None or context[0] == source]:
+                del self._entries[slot]
+                # Нулевой ключ никогда не совпадет с нормализованным запросом
+                self._keys[slot] = 0.0
+                self._free.append(slot)
+
 
 class QdrantService:
     """
@@ -20,30 +186,75 @@ class QdrantService:
     - reddit_posts
     - telegram_news (резерв)
 
-    Автоматически создаёт коллекцию если её нет.
+    Автоматически создаёт коллекцию если её нет. Векторы нормируются на
+    клиенте, поэтому новые коллекции создаются с Distance.DOT; созданные
+    ранее коллекции с Distance.COSINE продолжают работать без миграции
+    (для нормированных векторов результаты совпадают).
     """
 
     COLLECTIONS = {
         "habr": {
             "name": "habr_articles",
             "vector_size": 768,  # ← ИЗМЕНЕНО: 768 для nomic-embed-text
-            "distance": Distance.COSINE
+            "distance": Distance.DOT
         },
         "reddit": {
             "name": "reddit_posts",
             "vector_size": 768,  # ← ИЗМЕНЕНО: 768 для nomic-embed-text
-            "distance": Distance.COSINE
+            "distance": Distance.DOT
         },
     }
 
     def __init__(self, url: Optional[str] = None):
         self.url = url or os.getenv("QDRANT_URL", "http://qdrant:6333")
 
-        self.client = QdrantClient(url=self.url, timeout=10)
-        logger.info(f"Qdrant подключен: {self.url}")
+        self.client = QdrantClient(
+            url=self.url,
+            prefer_grpc=_QDRANT_PREFER_GRPC,
+            grpc_port=_QDRANT_GRPC_PORT,
+            timeout=10,
+        )
+        logger.info(f"Qdrant подключен: {self.url} ({'gRPC' if _QDRANT_PREFER_GRPC else 'HTTP'})")
+
+        # qdrant_id → отпечаток последней записанной точки (LRU).
+        # Повторный upsert той же точки без изменений пропускается.
+        self._seen: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._seen_lock = threading.Lock()
+
+        self._sim_cache = (
+            _SimilarityCache(_QDRANT_SIM_CACHE_SIZE, _QDRANT_SIM_CACHE_EPS, _QDRANT_SIM_CACHE_TTL)
+            if _QDRANT_SIM_CACHE_SIZE > 0 else None
+        )
+
+        # Поиск по тексту: ключ — sha1 нормализованного текста и параметры поиска
+        self._text_search_cache = functools.lru_cache(maxsize=_QDRANT_TEXT_CACHE_SIZE)(self._search_by_text_hash)
 
         self._ensure_all_collections()
 
+    def _invalidate_caches(self, source: Optional[str] = None) -> None:
+        """Сброс кэшей поиска после изменения коллекции."""
+        if self._sim_cache is not None:
+            self._sim_cache.invalidate(source)
+        self._text_search_cache.cache_clear()
+
+    def _is_unchanged(self, source: str, qdrant_id: str, fingerprint: bytes) -> bool:
+        """Точка уже записана этим процессом с тем же вектором и payload."""
+        key = (source, qdrant_id)
+        with self._seen_lock:
+            if self._seen.get(key) == fingerprint:
+                self._seen.move_to_end(key)
+                return True
+        return False
+
+    def _remember(self, source: str, qdrant_id: str, fingerprint: bytes) -> None:
+        """Запомнить записанную точку, вытесняя самые старые записи."""
+        key = (source, qdrant_id)
+        with self._seen_lock:
+            self._seen[key] = fingerprint
+            self._seen.move_to_end(key)
+            while len(self._seen) > _QDRANT_SEEN_CACHE_SIZE:
+                self._seen.popitem(last=False)
+
     def _ensure_all_collections(self):
         """Создаёт коллекции если отсутствуют."""
         existing = {c.name for c in self.client.get_collections().collections}
@@ -51,18 +262,47 @@ class QdrantService:
         for source, cfg in self.COLLECTIONS.items():
             if cfg["name"] not in existing:
                 logger.info(f"Создание коллекции: {cfg['name']} (размер: {cfg['vector_size']})")
-                self.client.create_collection(
-                    collection_name=cfg["name"],
-                    vectors_config=VectorParams(
-                        size=cfg["vector_size"],
-                        distance=cfg["distance"]
-                    )
-                )
+                self._create_collection(cfg)
             else:
                 logger.debug(f"Коллекция '{cfg['name']}' уже существует")
 
+    def _create_collection(self, cfg: Dict[str, Any]):
+        """
+        Создаёт коллекцию со скалярной квантизацией int8.
+
+        Квантованные векторы держатся в RAM и используются при обходе HNSW,
+        оригинальные float32 векторы — для пересчета (rescore) top-K.
+        Если задан QDRANT_SHARDS, коллекция делится на столько шардов,
+        которые Qdrant обходит параллельно.
+        """
+        self.client.create_collection(
+            collection_name=cfg["name"],
+            vectors_config=VectorParams(
+                size=cfg["vector_size"],
+                distance=cfg["distance"],
+                on_disk=_VECTORS_ON_DISK
+            ),
+            shard_number=_QDRANT_SHARDS if _QDRANT_SHARDS > 0 else None,
+            optimizers_config=(
+                OptimizersConfigDiff(default_segment_number=_QDRANT_SEGMENTS)
+                if _QDRANT_SEGMENTS > 0 else None
+            ),
+            quantization_config=ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    # Границы квантования без 1% выбросов
+                    quantile=0.99,
+                    always_ram=True
+                )
+            )
+        )
+
     def recreate_collections(self):
         """Пересоздать все коллекции с правильной размерностью."""
+        with self._seen_lock:
+            self._seen.clear()
+        self._invalidate_caches()
+
         for source, cfg in self.COLLECTIONS.items():
             try:
                 self.client.delete_collection(cfg["name"])
@@ -70,79 +310,398 @@ class QdrantService:
             except:
                 pass
 
-            self.client.create_collection(
-                collection_name=cfg["name"],
-                vectors_config=VectorParams(
-                    size=cfg["vector_size"],
-                    distance=cfg["distance"]
-                )
-            )
+            self._create_collection(cfg)
             logger.info(f"Создана коллекция: {cfg['name']} (размер: {cfg['vector_size']})")
 
     def save_embedding(
         self,
         source: str,
-        vector: List[float],
+        vector: Vector,
         metadata: Dict[str, Any],
         qdrant_id: Optional[str] = None,
     ) -> str:
         """
         Добавить (upsert) embedding в Qdrant.
 
+        Без qdrant_id ID выводится из url/title payload (uuid5), иначе случайный.
+        Если точка с тем же ID, вектором и payload уже записана этим
+        процессом, повторный upsert пропускается.
+
         Args:
             source: 'habr' | 'reddit'
             vector: embedding моделью
             metadata: метаданные (title, url, author,…)
         """
         cfg = self.COLLECTIONS[source]
+        vector = _normalized(vector)
 
-        qdrant_id = qdrant_id or str(uuid.uuid4())
+        fingerprint = None
+        qdrant_id = qdrant_id or _id_from_payload(metadata)
+        if qdrant_id:
+            fingerprint = _fingerprint(vector, metadata)
+            if self._is_unchanged(source, qdrant_id, fingerprint):
+                logger.debug(f"[Qdrant] Без изменений → {source}: {qdrant_id}")
+                return qdrant_id
+        else:
+            qdrant_id = random_uuid()
 
         self.client.upsert(
             collection_name=cfg["name"],
-            points=[PointStruct(id=qdrant_id, vector=vector, payload=metadata)],
+            points=[PointStruct(id=qdrant_id, vector=_to_list(vector), payload=metadata)],
         )
 
+        if fingerprint is not None:
+            self._remember(source, qdrant_id, fingerprint)
+        self._invalidate_caches(source)
+
         logger.debug(f"[Qdrant] Saved → {source}: {metadata.get('title', '')}")
         return qdrant_id
 
+    def save_embeddings_batch(
+        self,
+        source: str,
+        items: List[Tuple[Vector, Dict[str, Any], Optional[str]]],
+        wait: bool = False,
+    ) -> List[str]:
+        """
+        Добавить (upsert) пачку embeddings в Qdrant одним запросом.
+
+        По умолчанию запрос не ждет применения изменений (wait=False): Qdrant
+        подтверждает прием, а индексирует и сохраняет точки асинхронно. Точки
+        с явным qdrant_id, уже записанные без изменений, не отправляются.
+
+        Args:
+            source: 'habr' | 'reddit'
+            items: список (vector, metadata, qdrant_id); если qdrant_id None,
+                он выводится из url/title payload, как в save_embedding
+            wait: дождаться применения изменений Qdrant
+
+        Returns:
+            ID точек в порядке items
+        """
+        if not items:
+            return []
+
+        cfg = self.COLLECTIONS[source]
+
+        ids = []
+        # Точки для отправки в колоночном виде (models.Batch) без PointStruct
+        batch_ids = []
+        batch_vectors = []
+        batch_payloads = []
+        fingerprints = []
+        for vector, metadata, qdrant_id in items:
+            vector = _normalized(vector)
+            qdrant_id = qdrant_id or _id_from_payload(metadata)
+            if qdrant_id:
+                fingerprint = _fingerprint(vector, metadata)
+                if self._is_unchanged(source, qdrant_id, fingerprint):
+                    ids.append(qdrant_id)
+                    continue
+                fingerprints.append((qdrant_id, fingerprint))
+            else:
+                qdrant_id = random_uuid()
+
+            ids.append(qdrant_id)
+            batch_ids.append(qdrant_id)
+            batch_vectors.append(vector)
+            batch_payloads.append(metadata)
+
+        if not batch_ids:
+            logger.debug(f"[Qdrant] Batch без изменений → {source}: {len(ids)} точек")
+            return ids
+
+        self.client.upsert(
+            collection_name=cfg["name"],
+            points=Batch(
+                ids=batch_ids,
+                # Один tolist на всю матрицу вместо преобразования по вектору
+                vectors=np.stack(batch_vectors).tolist(),
+                payloads=batch_payloads,
+            ),
+            wait=wait,
+        )
+
+        for qdrant_id, fingerprint in fingerprints:
+            self._remember(source, qdrant_id, fingerprint)
+        self._invalidate_caches(source)
+
+        logger.debug(f"[Qdrant] Saved batch → {source}: {len(batch_ids)} точек")
+        return ids
+
+    def batch_writer(self, source: str, batch_size: int = 128) -> "BatchWriter":
+        """
+        Буферизованная запись точек пачками.
+
+            with qdrant.batch_writer("habr") as writer:
+                for vector, metadata in items:
+                    writer.add(vector, metadata)
+
+        Args:
+            source: 'habr' | 'reddit'
+            batch_size: размер пачки (64-256)
+        """
+        return BatchWriter(self, source, batch_size)
+
     def search_similar(
         self,
         source: str,
-        vector: List[float],
+        vector: Vector,
         limit: int = 5,
-        score_threshold: float = 0.9
+        score_threshold: float = 0.9,
+        ef: int = 64,
+        payload_fields: Optional[List[str]] = None,
     ) -> List[Dict[str, Any]]:
-        """Поиск похожих объектов в соответствующей коллекции."""
+        """
+        Поиск похожих объектов в соответствующей коллекции.
+
+        Args:
+            source: 'habr' | 'reddit'
+            vector: embedding запроса
+            limit: максимум результатов
+            score_threshold: минимальная близость
+            ef: глубина обхода HNSW графа (больше — точнее и медленнее)
+            payload_fields: поля payload в ответе; None — весь payload
+
+        Повторный запрос с почти тем же вектором (см. QDRANT_SIM_CACHE_EPS)
+        отвечается из локального кэша без обращения к Qdrant.
+        """
         cfg = self.COLLECTIONS[source]
+        vector = _normalized(vector)
+
+        context = None
+        if self._sim_cache is not None:
+            context = (source, limit, score_threshold, ef, tuple(payload_fields or ()))
+            cached = self._sim_cache.get(context, vector)
+            if cached is not None:
+                return cached
 
         try:
             results = self.client.search(
                 collection_name=cfg["name"],
+                # numpy массив клиент сериализует сам (в gRPC — packed float)
                 query_vector=vector,
                 limit=limit,
                 score_threshold=score_threshold,
+                search_params=self._search_params(ef),
+                with_payload=self._with_payload(payload_fields),
+                with_vectors=False,
             )
+            hits = self._hits_to_dicts(results)
 
-            return [
-                {
-                    "qdrant_id": hit.id,
-                    "score": hit.score,
-                    **hit.payload
-                }
-                for hit in results
-            ]
+            if self._sim_cache is not None:
+                self._sim_cache.put(context, vector, hits)
+                hits = [dict(hit) for hit in hits]
+
+            return hits
 
         except Exception as e:
             logger.error(f"Ошибка поиска в Qdrant ({source}): {e}")
             return []
 
+    def search_similar_text(
+        self,
+        source: str,
+        text: str,
+        limit: int = 5,
+        score_threshold: float = 0.9,
+    ) -> List[Dict[str, Any]]:
+        """
+        Поиск похожих объектов по тексту (embedding через Ollama + search_similar).
+
+        Результаты для одинакового (после схлопывания пробелов) текста
+        берутся из LRU кэша без вызова embedding модели и Qdrant; кэш
+        сбрасывается при записи в коллекции.
+
+        Args:
+            source: 'habr' | 'reddit'
+            text: текст запроса
+            limit: максимум результатов
+            score_threshold: минимальная близость
+        """
+        normalized = " ".join(text.split())
+        if not normalized:
+            return []
+
+        digest = hashlib.sha1(normalized.encode("utf-8")).digest()
+        hits = self._text_search_cache(source, digest, normalized, limit, score_threshold)
+        return [dict(hit) for hit in hits]
+
+    def _search_by_text_hash(
+        self,
+        source: str,
+        digest: bytes,
+        text: str,
+        limit: int,
+        score_threshold: float,
+    ) -> Tuple[Dict[str, Any], ...]:
+        """Embedding + поиск для LRU кэша search_similar_text."""
+        vector = get_ollama_service().get_embedding(text)
+        if vector is None:
+            return ()
+        return tuple(self.search_similar(source, vector, limit=limit, score_threshold=score_threshold))
+
+    def get_collection_info(self, source: str) -> Dict[str, Any]:
+        """
+        Состояние коллекции и статистика кэша поиска по тексту.
+
+        Args:
+            source: 'habr' | 'reddit'
+
+        Returns:
+            Словарь с name, status, points_count и text_cache (hits, misses, hit_rate)
+        """
+        cfg = self.COLLECTIONS[source]
+        info = self.client.get_collection(cfg["name"])
+
+        cache = self._text_search_cache.cache_info()
+        total = cache.hits + cache.misses
+        hit_rate = cache.hits / total if total else 0.0
+        logger.info(
+            f"[Qdrant] {cfg['name']}: {info.points_count} точек, "
+            f"кэш поиска по тексту {cache.hits}/{total} ({hit_rate:.0%})"
+        )
+
+        return {
+            "name": cfg["name"],
+            "status": str(info.status),
+            "points_count": info.points_count,
+            "text_cache": {**cache._asdict(), "hit_rate": hit_rate},
+        }
+
+    def search_similar_batch(
+        self,
+        source: str,
+        vectors: List[Vector],
+        limit: int = 5,
+        score_threshold: float = 0.9,
+        ef: int = 64,
+        payload_fields: Optional[List[str]] = None,
+        chunk_size: int = 32,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Пакетный поиск: несколько векторов за один запрос search_batch.
+
+        Большие пачки делятся на части по chunk_size (лимит размера сообщения
+        gRPC), которые отправляются параллельно.
+
+        Args:
+            source: 'habr' | 'reddit'
+            vectors: embeddings запросов
+            limit, score_threshold, ef, payload_fields: как в search_similar
+            chunk_size: векторов в одном запросе search_batch
+
+        Returns:
+            Результаты для каждого вектора в порядке vectors; при ошибке части
+            для ее векторов возвращаются пустые списки
+        """
+        if not vectors:
+            return []
+
+        cfg = self.COLLECTIONS[source]
+        search_params = self._search_params(ef)
+        with_payload = self._with_payload(payload_fields)
+
+        def search_chunk(chunk: List[Vector]) -> List[List[Dict[str, Any]]]:
+            requests = [
+                SearchRequest(
+                    vector=_to_list(_normalized(vector)),
+                    limit=limit,
+                    score_threshold=score_threshold,
+                    params=search_params,
+                    with_payload=with_payload,
+                    with_vector=False,
+                )
+                for vector in chunk
+            ]
+            try:
+                batch = self.client.search_batch(collection_name=cfg["name"], requests=requests)
+                return [self._hits_to_dicts(results) for results in batch]
+            except Exception as e:
+                logger.error(f"Ошибка пакетного поиска в Qdrant ({source}): {e}")
+                return [[] for _ in chunk]
+
+        chunks = [vectors[i:i + chunk_size] for i in range(0, len(vectors), chunk_size)]
+        if len(chunks) == 1:
+            return search_chunk(chunks[0])
+
+        with ThreadPoolExecutor(max_workers=min(len(chunks), _QDRANT_SEARCH_WORKERS)) as executor:
+            return [hits for chunk_hits in executor.map(search_chunk, chunks) for hits in chunk_hits]
+
+    @staticmethod
+    def _search_params(ef: int) -> SearchParams:
+        """Параметры HNSW обхода и пересчета квантованных векторов."""
+        return SearchParams(
+            hnsw_ef=ef,
+            exact=False,
+            quantization=QuantizationSearchParams(rescore=True, oversampling=2.0)
+        )
+
+    @staticmethod
+    def _with_payload(payload_fields: Optional[List[str]]):
+        """Проекция payload: только указанные поля или весь payload."""
+        return PayloadSelectorInclude(include=payload_fields) if payload_fields else True
+
+    @staticmethod
+    def _hits_to_dicts(results) -> List[Dict[str, Any]]:
+        """Преобразование ScoredPoint в словари с qdrant_id, score и payload."""
+        return [
+            {
+                "qdrant_id": hit.id,
+                "score": hit.score,
+                **(hit.payload or {})
+            }
+            for hit in results
+        ]
+
+
+class BatchWriter:
+    """
+    Накопитель точек для save_embeddings_batch.
+
+    Отправляет пачку, когда буфер достигает batch_size, и остаток при выходе
+    из контекста. Промежуточные пачки не ждут индексации (wait=False),
+    остаток при выходе отправляется с ожиданием применения (wait=True).
+    """
+
+    def __init__(self, service: QdrantService, source: str, batch_size: int = 128):
+        self.service = service
+        self.source = source
+        self.batch_size = batch_size
+        self.ids: List[str] = []
+        self._buffer: List[Tuple[Vector, Dict[str, Any], Optional[str]]] = []
+
+    def add(self, vector: Vector, metadata: Dict[str, Any], qdrant_id: Optional[str] = None) -> None:
+        """Добавить точку в буфер, отправив пачку при заполнении."""
+        self._buffer.append((vector, metadata, qdrant_id))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self, wait: bool = False) -> None:
+        """Отправить накопленные точки."""
+        if not self._buffer:
+            return
+        buffer, self._buffer = self._buffer, []
+        self.ids.extend(self.service.save_embeddings_batch(self.source, buffer, wait=wait))
+
+    def __enter__(self) -> "BatchWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.flush(wait=True)
+
 
 _qdrant_instance: Optional[QdrantService] = None
+_qdrant_lock = threading.Lock()
 
 
 def get_qdrant_service() -> QdrantService:
     global _qdrant_instance
     if _qdrant_instance is None:
-        _qdrant_instance = QdrantService()
+        with _qdrant_lock:
+            # Повторная проверка под блокировкой: конкурентный первый вызов
+            # не создаст второй клиент. Соединение прогревается в __init__
+            # запросом списка коллекций.
+            if _qdrant_instance is None:
+                _qdrant_instance = QdrantService()
     return _qdrant_instance
\ No newline at end of file
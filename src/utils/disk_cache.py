@@ -0,0 +1,125 @@
+"""
+Персистентный кэш ответов LLM в SQLite.
+
+Точные совпадения (модель, system, prompt) переживают перезапуск контейнера,
+в отличие от in-process LRU кэша.
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Union, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """Кэш ответов LLM в SQLite с режимом WAL."""
+
+    def __init__(self, path: Union[str, Path], ttl: Optional[int] = None):
+        """
+        Открытие (создание) файла кэша.
+
+        Args:
+            path: Путь к файлу базы SQLite
+            ttl: Время жизни записи в секундах; None — без ограничения
+
+        Raises:
+            sqlite3.Error, OSError: Если файл нельзя создать или открыть
+        """
+        self.path = Path(path)
+        self.ttl = ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Одно соединение на процесс, доступ сериализуется блокировкой
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, created_at INTEGER)"
+            )
+            self._conn.commit()
+
+        logger.info(f"Дисковый кэш LLM: {self.path}")
+
+    @staticmethod
+    def make_key(
+            model: str,
+            system: Optional[str],
+            prompt: str,
+            options: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Ключ записи по модели, промптам и параметрам генерации.
+
+        Args:
+            model: Модель
+            system: Системный промт
+            prompt: Пользовательский промт
+            options: Параметры генерации (temperature, num_predict, num_ctx...);
+                ответы с разными параметрами хранятся раздельно
+
+        Returns:
+            SHA-256 в hex
+        """
+        options_json = json.dumps(options or {}, sort_keys=True, default=str)
+        return hashlib.sha256(
+            f"{model}|{system or ''}|{prompt}|{options_json}".encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Получение ответа по ключу.
+
+        Args:
+            key: Ключ из make_key
+
+        Returns:
+            Сохраненный ответ или None (нет записи, истек срок, ошибка)
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Ошибка чтения дискового кэша: {e}")
+            return None
+
+        if row is None:
+            return None
+        if self.ttl is not None and time.time() - row[1] > self.ttl:
+            return None
+        return row[0]
+
+    def set(self, key: str, model: str, response: str) -> None:
+        """
+        Сохранение ответа.
+
+        Args:
+            key: Ключ из make_key
+            model: Модель (для обслуживания базы)
+            response: Ответ LLM
+        """
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at) VALUES (?, ?, ?, ?)",
+                    (key, model, response, int(time.time()))
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Ошибка записи дискового кэша: {e}")
+
+    def close(self) -> None:
+        """Закрытие соединения."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,49 @@
+"""
+Генерация случайных UUID пачками.
+
+Байты для сотни идентификаторов читаются одним вызовом os.urandom вместо
+системного вызова и объекта UUID на каждый uuid.uuid4().
+"""
+
+import os
+import uuid
+import threading
+from collections import deque
+from typing import List
+
+# Сколько идентификаторов генерировать за одно пополнение пула
+_POOL_SIZE = 256
+
+_pool: deque = deque()
+_lock = threading.Lock()
+
+# Дочерний процесс не должен выдавать те же ID, что и родитель
+os.register_at_fork(after_in_child=_pool.clear)
+
+
+def random_uuids(n: int) -> List[str]:
+    """
+    Сгенерировать n случайных UUID версии 4.
+
+    Args:
+        n: Количество идентификаторов
+
+    Returns:
+        Строки UUID в стандартном формате с дефисами
+    """
+    buf = os.urandom(16 * n)
+    return [str(uuid.UUID(bytes=buf[i:i + 16], version=4)) for i in range(0, 16 * n, 16)]
+
+
+def random_uuid() -> str:
+    """Случайный UUID версии 4 из пула (аналог str(uuid.uuid4()))."""
+    while True:
+        try:
+            return _pool.popleft()
+        except IndexError:
+            with _lock:
+                if not _pool:
+                    _pool.extend(random_uuids(_POOL_SIZE))
+
+
+__all__ = ['random_uuid', 'random_uuids']
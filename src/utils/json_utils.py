@@ -0,0 +1,31 @@
+"""
+Быстрая JSON сериализация с откатом на стандартный json.
+
+Использует orjson если он установлен. Ошибки разбора в обоих случаях
+являются подклассами json.JSONDecodeError.
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson есть в requirements.txt
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Сериализовать объект в UTF-8 JSON без экранирования не-ASCII символов."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    """Разобрать JSON из bytes или str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+__all__ = ['dumps', 'loads']
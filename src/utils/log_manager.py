@@ -5,17 +5,74 @@
 Следует Dependency Inversion Principle с абстрактным интерфейсом хранилища.
 """
 
+import os
 import json
+import time
+import queue
+import atexit
 import logging
-import uuid
+import threading
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Union
 from pathlib import Path
 from dataclasses import dataclass, asdict
 
+from src.utils import json_utils
+from src.utils.ids import random_uuid
+
 logger = logging.getLogger(__name__)
 
+# Очередь записей LogManager для фонового потока; при переполнении
+# вытесняются самые старые записи
+_LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Максимум записей, отправляемых в хранилище за один раз
+_LOG_WRITE_BATCH = 256
+# Ожидание фонового потока перед чтением и очисткой: запрос не должен
+# висеть, если хранилище тормозит; недописанные записи появятся позже
+_READ_FLUSH_TIMEOUT = 0.5
+
+# Удаление записей сессии (ARGV[1]) на стороне Redis одним атомарным вызовом.
+# Поиск подстроки отсеивает записи других сессий без разбора JSON; у
+# остальных сравнивается поле session_id верхнего уровня (тот же ID может
+# встречаться в тексте или context). Перебор с конца сохраняет порядок списка.
+_CLEAR_SESSION_LUA = """
+local logs = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1])
+for i = #logs, 1, -1 do
+    local matched = false
+    if string.find(logs[i], ARGV[1], 1, true) then
+        local ok, entry = pcall(cjson.decode, logs[i])
+        matched = ok and type(entry) == 'table' and entry.session_id == ARGV[1]
+    end
+    if not matched then
+        redis.call('LPUSH', KEYS[1], logs[i])
+    end
+end
+"""
+
+# (секунда, "%Y-%m-%dT%H:%M:%S" в UTC) последней записи лога
+_iso_cache = (0, '')
+
+
+def _utc_timestamp() -> str:
+    """
+    Текущее время UTC в ISO формате с микросекундами без создания datetime.
+
+    Часть до секунд кэшируется и пересчитывается раз в секунду.
+
+    Returns:
+        Строка вида 2024-01-01T12:00:00.123456
+    """
+    global _iso_cache
+    ns = time.time_ns()
+    sec, micros = divmod(ns // 1000, 1_000_000)
+    cached = _iso_cache
+    if cached[0] != sec:
+        cached = (sec, time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(sec)))
+        _iso_cache = cached
+    return f"{cached[1]}.{micros:06d}"
+
 
 @dataclass
 class LogEntry:
@@ -27,8 +84,14 @@ class LogEntry:
     context: Optional[Dict[str, Any]] = None
 
     def to_dict(self) -> Dict[str, Any]:
-        """Конвертация в словарь."""
-        return asdict(self)
+        """Конвертация в словарь (без глубокого копирования asdict)."""
+        return {
+            'timestamp': self.timestamp,
+            'level': self.level,
+            'message': self.message,
+            'session_id': self.session_id,
+            'context': self.context
+        }
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'LogEntry':
@@ -49,10 +112,15 @@ class LogStorage(ABC):
     """Абстрактный интерфейс хранилища логов."""
 
     @abstractmethod
-    def add_log(self, entry: LogEntry) -> None:
-        """Добавить запись лога."""
+    def add_log(self, entry: Union[LogEntry, Dict[str, Any]]) -> None:
+        """Добавить запись лога (LogEntry или готовый словарь из LogEntry.to_dict)."""
         pass
 
+    def add_logs(self, entries: List[Union[LogEntry, Dict[str, Any]]]) -> None:
+        """Добавить несколько записей (по умолчанию по одной)."""
+        for entry in entries:
+            self.add_log(entry)
+
     @abstractmethod
     def get_logs(self, limit: int = 100, session_id: Optional[str] = None) -> List[LogEntry]:
         """Получить записи логов."""
@@ -94,28 +162,49 @@ class RedisLogStorage(LogStorage):
             ConnectionError: Если не удаётся подключиться к Redis
         """
         import redis
-        self.redis_client = redis.from_url(redis_url, decode_responses=True)
+        # Записи хранятся как UTF-8 JSON bytes, декодирование ответов не нужно
+        self.redis_client = redis.from_url(redis_url, decode_responses=False)
         self.max_logs = max_logs
         self.log_key = "parsing_logs"
         self.session_key = "parsing_sessions"
+        self._clear_session_script = self.redis_client.register_script(_CLEAR_SESSION_LUA)
+        self._pipe_factory = self.redis_client.pipeline
 
         # Проверка подключения
         self.redis_client.ping()
         logger.info(f"Redis хранилище инициализировано: {redis_url}")
 
-    def add_log(self, entry: LogEntry) -> None:
-        """Добавить запись лога в Redis."""
-        self.redis_client.lpush(self.log_key, json.dumps(entry.to_dict()))
-        self.redis_client.ltrim(self.log_key, 0, self.max_logs - 1)
+    def add_log(self, entry: Union[LogEntry, Dict[str, Any]]) -> None:
+        """Добавить запись лога в Redis (LPUSH и LTRIM за один запрос)."""
+        self.add_logs([entry])
+
+    def add_logs(self, entries: List[Union[LogEntry, Dict[str, Any]]]) -> None:
+        """Добавить пачку записей одним LPUSH и LTRIM за один запрос."""
+        if not entries:
+            return
+        payloads = [
+            json_utils.dumps(entry if isinstance(entry, dict) else entry.to_dict())
+            for entry in entries
+        ]
+        pipe = self._pipe_factory(transaction=False)
+        pipe.lpush(self.log_key, *payloads)
+        pipe.ltrim(self.log_key, 0, self.max_logs - 1)
+        pipe.execute()
 
     def get_logs(self, limit: int = 100, session_id: Optional[str] = None) -> List[LogEntry]:
         """Получить логи из Redis."""
         logs = self.redis_client.lrange(self.log_key, 0, limit - 1)
         entries = []
 
+        if session_id is not None:
+            # Поиск подстроки дешевле разбора JSON: разбираются только
+            # записи, в которых встречается "<session_id>"
+            encoded = json_utils.dumps(session_id)
+            logs = [log for log in logs if encoded in log]
+
         for log in logs:
             try:
-                data = json.loads(log)
+                data = json_utils.loads(log)
                 if session_id is None or data.get('session_id') == session_id:
                     entries.append(LogEntry.from_dict(data))
             except (json.JSONDecodeError, TypeError) as e:
@@ -126,20 +215,13 @@ class RedisLogStorage(LogStorage):
     def clear_logs(self, session_id: Optional[str] = None) -> None:
         """Очистить логи в Redis."""
         if session_id:
-            logs = self.redis_client.lrange(self.log_key, 0, -1)
-            to_keep = [
-                log for log in logs
-                if json.loads(log).get('session_id') != session_id
-            ]
-            self.redis_client.delete(self.log_key)
-            if to_keep:
-                self.redis_client.lpush(self.log_key, *to_keep)
+            self._clear_session_script(keys=[self.log_key], args=[session_id])
         else:
             self.redis_client.delete(self.log_key)
 
     def create_session(self) -> str:
         """Создать новую сессию в Redis."""
-        session_id = str(uuid.uuid4())
+        session_id = random_uuid()
         session = Session(
             id=session_id,
             created_at=datetime.utcnow().isoformat(),
@@ -148,7 +230,7 @@ class RedisLogStorage(LogStorage):
         self.redis_client.hset(
             self.session_key,
             session_id,
-            json.dumps(asdict(session))
+            json_utils.dumps(asdict(session))
         )
         return session_id
 
@@ -156,13 +238,13 @@ class RedisLogStorage(LogStorage):
         """Закрыть сессию в Redis."""
         session_data = self.redis_client.hget(self.session_key, session_id)
         if session_data:
-            session = json.loads(session_data)
+            session = json_utils.loads(session_data)
             session['status'] = 'closed'
             session['closed_at'] = datetime.utcnow().isoformat()
             self.redis_client.hset(
                 self.session_key,
                 session_id,
-                json.dumps(session)
+                json_utils.dumps(session)
             )
 
     def get_active_sessions(self) -> List[Session]:
@@ -172,7 +254,7 @@ class RedisLogStorage(LogStorage):
 
         for session_id, data in sessions_data.items():
             try:
-                session_dict = json.loads(data)
+                session_dict = json_utils.loads(data)
                 if session_dict.get('status') == 'active':
                     active_sessions.append(Session(**session_dict))
             except (json.JSONDecodeError, TypeError):
@@ -182,7 +264,13 @@ class RedisLogStorage(LogStorage):
 
 
 class FileLogStorage(LogStorage):
-    """Файловое хранилище логов (резервное)."""
+    """
+    Файловое хранилище логов (резервное).
+
+    Логи дописываются в JSON Lines файл по одной строке на запись, поэтому
+    запись лога не зависит от размера истории. Файл переписывается целиком
+    только при очистке и когда число строк превышает max_logs на 25%.
+    """
 
     def __init__(self, log_dir: Path = Path('/app/logs'), max_logs: int = 1000):
         """
@@ -195,10 +283,15 @@ class FileLogStorage(LogStorage):
         self.log_dir = log_dir
         self.log_dir.mkdir(parents=True, exist_ok=True)
         self.max_logs = max_logs
-        self.logs_file = self.log_dir / 'parsing_logs.json'
+        self.logs_file = self.log_dir / 'parsing_logs.jsonl'
         self.sessions_file = self.log_dir / 'sessions.json'
+        self._legacy_logs_file = self.log_dir / 'parsing_logs.json'
         self._logs: List[Dict] = []
         self._sessions: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._fh = None
+        # Число строк в файле логов, включая вытесненные из памяти
+        self._file_lines = 0
         self._load_data()
         logger.info(f"Файловое хранилище инициализировано: {self.log_dir}")
 
@@ -207,7 +300,23 @@ class FileLogStorage(LogStorage):
         if self.logs_file.exists():
             try:
                 with open(self.logs_file, 'r', encoding='utf-8') as f:
-                    self._logs = json.load(f)
+                    lines = f.readlines()
+                self._file_lines = len(lines)
+                for line in lines[-self.max_logs:]:
+                    try:
+                        self._logs.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Недописанная строка после аварийного завершения
+                        continue
+            except Exception as e:
+                logger.warning(f"Не удалось загрузить логи: {e}")
+                self._logs = []
+        elif self._legacy_logs_file.exists():
+            # Перенос логов из прежнего формата (один JSON массив)
+            try:
+                with open(self._legacy_logs_file, 'r', encoding='utf-8') as f:
+                    self._logs = json.load(f)[-self.max_logs:]
+                self._rewrite_logs()
             except Exception as e:
                 logger.warning(f"Не удалось загрузить логи: {e}")
                 self._logs = []
@@ -220,23 +329,56 @@ class FileLogStorage(LogStorage):
                 logger.warning(f"Не удалось загрузить сессии: {e}")
                 self._sessions = {}
 
-    def _save_data(self) -> None:
-        """Сохранить данные в файлы."""
+    def _rewrite_logs(self) -> None:
+        """Переписать файл логов содержимым памяти (вызывать под блокировкой)."""
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+        tmp_file = self.logs_file.with_suffix('.jsonl.tmp')
         try:
-            with open(self.logs_file, 'w', encoding='utf-8') as f:
-                json.dump(self._logs, f, ensure_ascii=False, indent=2)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(log, ensure_ascii=False) + '\n' for log in self._logs)
+            tmp_file.replace(self.logs_file)
+            self._file_lines = len(self._logs)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить логи: {e}")
 
+    def _save_sessions(self) -> None:
+        """Сохранить сессии в файл."""
+        try:
             with open(self.sessions_file, 'w', encoding='utf-8') as f:
                 json.dump(self._sessions, f, ensure_ascii=False, indent=2)
         except Exception as e:
-            logger.error(f"Не удалось сохранить данные: {e}")
+            logger.error(f"Не удалось сохранить сессии: {e}")
+
+    def add_log(self, entry: Union[LogEntry, Dict[str, Any]]) -> None:
+        """Дописать запись лога в конец файла."""
+        self.add_logs([entry])
+
+    def add_logs(self, entries: List[Union[LogEntry, Dict[str, Any]]]) -> None:
+        """Дописать пачку записей в конец файла одной записью."""
+        if not entries:
+            return
+        records = [entry if isinstance(entry, dict) else entry.to_dict() for entry in entries]
+        text = ''.join(json.dumps(data, ensure_ascii=False) + '\n' for data in records)
 
-    def add_log(self, entry: LogEntry) -> None:
-        """Добавить запись лога в файл."""
-        self._logs.append(entry.to_dict())
-        if len(self._logs) > self.max_logs:
-            self._logs = self._logs[-self.max_logs:]
-        self._save_data()
+        with self._lock:
+            self._logs.extend(records)
+            if len(self._logs) > self.max_logs:
+                del self._logs[:-self.max_logs]
+
+            try:
+                if self._fh is None:
+                    # Построчная буферизация: пачка попадает в файл сразу после write
+                    self._fh = open(self.logs_file, 'a', encoding='utf-8', buffering=1)
+                self._fh.write(text)
+                self._file_lines += len(records)
+            except Exception as e:
+                logger.error(f"Не удалось сохранить лог: {e}")
+
+            if self._file_lines > self.max_logs * 1.25:
+                self._rewrite_logs()
 
     def get_logs(self, limit: int = 100, session_id: Optional[str] = None) -> List[LogEntry]:
         """Получить логи из файла."""
@@ -249,24 +391,25 @@ class FileLogStorage(LogStorage):
 
     def clear_logs(self, session_id: Optional[str] = None) -> None:
         """Очистить логи в файле."""
-        if session_id:
-            self._logs = [
-                log for log in self._logs
-                if log.get('session_id') != session_id
-            ]
-        else:
-            self._logs = []
-        self._save_data()
+        with self._lock:
+            if session_id:
+                self._logs = [
+                    log for log in self._logs
+                    if log.get('session_id') != session_id
+                ]
+            else:
+                self._logs = []
+            self._rewrite_logs()
 
     def create_session(self) -> str:
         """Создать новую сессию в файле."""
-        session_id = str(uuid.uuid4())
+        session_id = random_uuid()
         self._sessions[session_id] = {
             'id': session_id,
             'created_at': datetime.utcnow().isoformat(),
             'status': 'active'
         }
-        self._save_data()
+        self._save_sessions()
         return session_id
 
     def close_session(self, session_id: str) -> None:
@@ -274,7 +417,7 @@ class FileLogStorage(LogStorage):
         if session_id in self._sessions:
             self._sessions[session_id]['status'] = 'closed'
             self._sessions[session_id]['closed_at'] = datetime.utcnow().isoformat()
-            self._save_data()
+            self._save_sessions()
 
     def get_active_sessions(self) -> List[Session]:
         """Получить активные сессии из файла."""
@@ -290,6 +433,10 @@ class LogManager:
     Главный менеджер логов с автоматическим выбором бэкенда хранилища.
 
     Сначала пытается использовать Redis, откатывается к файловому хранилищу если недоступен.
+
+    add_log не ждет хранилище: записи ставятся в ограниченную очередь, а
+    фоновый поток отправляет их пачками (один pipeline Redis или одна
+    дозапись файла). Чтение и очистка сначала дожидаются записи очереди.
     """
 
     def __init__(
@@ -321,6 +468,75 @@ class LogManager:
             self.storage = FileLogStorage(log_dir, max_logs)
             logger.info("Использую файловое хранилище логов")
 
+        self._queue: queue.Queue = queue.Queue(maxsize=_LOG_QUEUE_SIZE)
+        self._writer = threading.Thread(target=self._drain, name="log-manager-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def _drain(self) -> None:
+        """Фоновый поток: запись очереди в хранилище пачками."""
+        while True:
+            items = [self._queue.get()]
+            while len(items) < _LOG_WRITE_BATCH:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Метки flush (threading.Event) отмечаются после записи пачки:
+            # все записи, поставленные до метки, к этому моменту записаны
+            entries = [item for item in items if not isinstance(item, threading.Event)]
+            try:
+                if entries:
+                    self.storage.add_logs(entries)
+            except Exception as e:
+                # Поток записи не должен падать из-за недоступного хранилища
+                logger.warning(f"Не удалось записать {len(entries)} записей лога: {e}")
+            finally:
+                for item in items:
+                    if isinstance(item, threading.Event):
+                        item.set()
+
+    def _enqueue(self, data: Dict[str, Any]) -> None:
+        """Поставить запись в очередь, вытесняя самую старую при переполнении."""
+        while True:
+            try:
+                self._queue.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    dropped = self._queue.get_nowait()
+                except queue.Empty:
+                    continue
+                # Вытеснена метка flush: все записи до нее уже обработаны
+                if isinstance(dropped, threading.Event):
+                    dropped.set()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Дождаться записи в хранилище всех записей, поставленных до вызова.
+
+        Записи, добавленные другими потоками после вызова, не ожидаются.
+
+        Args:
+            timeout: Максимальное время ожидания в секундах
+
+        Returns:
+            True, если записи сохранены до истечения таймаута
+        """
+        done = threading.Event()
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            logger.warning("Очередь логов переполнена, flush не дождался записи")
+            return False
+
+        if not done.wait(max(deadline - time.monotonic(), 0.0)):
+            logger.warning(f"Записи логов не сохранены за {timeout:g}с")
+            return False
+        return True
+
     def add_log(
         self,
         message: str,
@@ -329,14 +545,14 @@ class LogManager:
         context: Optional[Dict[str, Any]] = None
     ) -> None:
         """Добавить запись лога."""
-        entry = LogEntry(
-            timestamp=datetime.utcnow().isoformat(),
-            level=level.upper(),
-            message=message,
-            session_id=session_id or 'default',
-            context=context
-        )
-        self.storage.add_log(entry)
+        # Словарь в формате LogEntry.to_dict, без промежуточного LogEntry
+        self._enqueue({
+            'timestamp': _utc_timestamp(),
+            'level': level.upper(),
+            'message': message,
+            'session_id': session_id or 'default',
+            'context': context
+        })
 
         # Также логируем в Python logger
         log_func = getattr(logger, level.lower(), logger.info)
@@ -344,11 +560,13 @@ class LogManager:
 
     def get_logs(self, limit: int = 100, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Получить логи как словари."""
+        self.flush(timeout=_READ_FLUSH_TIMEOUT)
         entries = self.storage.get_logs(limit, session_id)
         return [entry.to_dict() for entry in entries]
 
     def clear_logs(self, session_id: Optional[str] = None) -> None:
         """Очистить логи."""
+        self.flush(timeout=_READ_FLUSH_TIMEOUT)
         self.storage.clear_logs(session_id)
 
     def create_session(self) -> str:
@@ -1,8 +1,9 @@
 """Thread-safe logger для многопоточной обработки."""
+import time
 import logging
 from typing import Optional
-from datetime import datetime
-from queue import Queue
+from collections import deque
+from itertools import islice
 import threading
 
 logging.basicConfig(
@@ -10,18 +11,33 @@ logging.basicConfig(
     format='%(asctime)s [%(levelname)s] %(name)s: %(message)s'
 )
 
+# (секунда, строка "%H:%M:%S") последнего лога; кортеж заменяется целиком,
+# поэтому чтение из разных потоков всегда согласовано
+_clock_cache = (0, '')
+
+
+def _clock_time() -> str:
+    """Локальное время "%H:%M:%S"; строка пересчитывается раз в секунду."""
+    global _clock_cache
+    sec = time.time_ns() // 1_000_000_000
+    cached = _clock_cache
+    if cached[0] != sec:
+        cached = (sec, time.strftime("%H:%M:%S", time.localtime(sec)))
+        _clock_cache = cached
+    return cached[1]
+
 
 class ThreadSafeLogger:
     """
     Thread-safe логгер для использования в многопоточных операциях.
 
-    Использует Queue для безопасной передачи логов между потоками
-    и основным процессом Streamlit.
+    Использует очередь (deque под блокировкой) для безопасной передачи
+    логов между потоками и основным процессом Streamlit.
     """
 
     def __init__(self, name: str = "processing"):
         self.logger = logging.getLogger(name)
-        self.log_queue: Queue = Queue()
+        self.log_queue: deque = deque()
         self._lock = threading.Lock()
 
     def log(self, message: str, level: str = "INFO"):
@@ -32,19 +48,20 @@ class ThreadSafeLogger:
             message: Текст сообщения
             level: Уровень (INFO, SUCCESS, WARNING, ERROR, DEBUG)
         """
-        timestamp = datetime.now().strftime("%H:%M:%S")
+        timestamp = _clock_time()
 
         # Логирование в стандартный logger
         logger_func = getattr(self.logger, level.lower(), self.logger.info)
         logger_func(message)
 
         # Добавление в очередь для UI (если используется)
+        entry = {
+            'timestamp': timestamp,
+            'level': level,
+            'message': message
+        }
         with self._lock:
-            self.log_queue.put({
-                'timestamp': timestamp,
-                'level': level,
-                'message': message
-            })
+            self.log_queue.append(entry)
 
     def get_logs(self, max_items: Optional[int] = None) -> list:
         """
@@ -56,17 +73,11 @@ class ThreadSafeLogger:
         Returns:
             Список логов
         """
-        logs = []
-        count = 0
-
-        while not self.log_queue.empty():
-            if max_items and count >= max_items:
-                break
-            try:
-                logs.append(self.log_queue.get_nowait())
-                count += 1
-            except:
-                break
+        # Вся выборка под одной блокировкой
+        with self._lock:
+            logs = list(islice(self.log_queue, max_items or None))
+            for _ in range(len(logs)):
+                self.log_queue.popleft()
 
         return logs
 
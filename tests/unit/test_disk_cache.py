@@ -0,0 +1,54 @@
+"""Тесты дискового кэша ответов LLM."""
+from src.utils import disk_cache
+from src.utils.disk_cache import DiskCache
+
+
+def test_set_and_get(tmp_path):
+    """Сохраненный ответ читается по ключу, неизвестный ключ — None."""
+    cache = DiskCache(tmp_path / "cache.sqlite3")
+    key = DiskCache.make_key("model", "system", "prompt")
+
+    assert cache.get(key) is None
+    cache.set(key, "model", "ответ")
+    assert cache.get(key) == "ответ"
+
+
+def test_survives_reopen(tmp_path):
+    """Записи сохраняются между открытиями файла."""
+    path = tmp_path / "nested" / "cache.sqlite3"
+    key = DiskCache.make_key("model", None, "prompt")
+
+    cache = DiskCache(path)
+    cache.set(key, "model", "ответ")
+    cache.close()
+
+    assert DiskCache(path).get(key) == "ответ"
+
+
+def test_ttl_expiry(tmp_path, monkeypatch):
+    """Просроченная запись не возвращается."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(disk_cache.time, "time", lambda: now[0])
+
+    cache = DiskCache(tmp_path / "cache.sqlite3", ttl=60)
+    cache.set("key", "model", "ответ")
+
+    now[0] += 59
+    assert cache.get("key") == "ответ"
+    now[0] += 2
+    assert cache.get("key") is None
+
+
+def test_make_key_depends_on_all_parts():
+    """Ключ различается по модели, промптам и параметрам генерации."""
+    base = DiskCache.make_key("m", "s", "p", {"temperature": 0.3, "num_predict": 100})
+    assert base == DiskCache.make_key("m", "s", "p", {"num_predict": 100, "temperature": 0.3})
+    assert base != DiskCache.make_key("m2", "s", "p", {"temperature": 0.3, "num_predict": 100})
+    assert base != DiskCache.make_key("m", "s2", "p", {"temperature": 0.3, "num_predict": 100})
+    assert base != DiskCache.make_key("m", "s", "p2", {"temperature": 0.3, "num_predict": 100})
+    assert base != DiskCache.make_key("m", "s", "p", {"temperature": 0.7, "num_predict": 100})
+
+
+def test_make_key_without_system():
+    """Отсутствие system промпта эквивалентно пустой строке."""
+    assert DiskCache.make_key("m", None, "p") == DiskCache.make_key("m", "", "p")
@@ -0,0 +1,188 @@
+"""Тесты log_manager."""
+import json
+import time
+import queue
+import threading
+
+import pytest
+
+from src.utils.log_manager import LogManager, RedisLogStorage, FileLogStorage
+
+
+class _BlockingStorage:
+    """Обертка хранилища, запись в которое ждет разрешения теста."""
+
+    def __init__(self, storage):
+        self._storage = storage
+        self.release = threading.Event()
+
+    def add_logs(self, entries):
+        self.release.wait(5)
+        self._storage.add_logs(entries)
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+
+def _file_manager(tmp_path):
+    """LogManager с файловым хранилищем во временном каталоге."""
+    return LogManager(log_dir=tmp_path, max_logs=100, prefer_redis=False)
+
+
+def test_get_logs_sees_queued_entries(tmp_path):
+    """Чтение дожидается записей, поставленных в очередь до него."""
+    manager = _file_manager(tmp_path)
+    for i in range(10):
+        manager.add_log(f"msg {i}", session_id="s1")
+
+    logs = manager.get_logs(limit=100, session_id="s1")
+    assert len(logs) == 10
+
+
+def test_flush_times_out_on_slow_storage(tmp_path):
+    """flush не ждет дольше таймаута и отмечается после записи пачки."""
+    manager = _file_manager(tmp_path)
+    storage = _BlockingStorage(manager.storage)
+    manager.storage = storage
+
+    manager.add_log("slow", session_id="s1")
+    assert manager.flush(timeout=0.05) is False
+
+    storage.release.set()
+    assert manager.flush(timeout=5) is True
+    assert [log['message'] for log in manager.get_logs(session_id="s1")] == ["slow"]
+
+
+def test_evicted_flush_marker_is_released(tmp_path):
+    """Метка flush, вытесненная из переполненной очереди, не зависает."""
+    manager = _file_manager(tmp_path)
+    storage = _BlockingStorage(manager.storage)
+    manager.storage = storage
+
+    # Поток записи занят первой записью, дальше очередь на две позиции
+    manager.add_log("first")
+    while not manager._queue.empty():
+        time.sleep(0.01)
+    manager._queue = queue.Queue(maxsize=2)
+
+    marker = threading.Event()
+    manager._queue.put(marker)
+    manager.add_log("second")
+    manager.add_log("third")
+
+    assert marker.is_set()
+    storage.release.set()
+
+
+@pytest.fixture
+def redis_storage(monkeypatch):
+    """RedisLogStorage поверх fakeredis с поддержкой Lua."""
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis, "from_url",
+        lambda url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs)
+    )
+    return RedisLogStorage(max_logs=100)
+
+
+def _entry(message, session_id, context=None):
+    """Запись лога в формате LogEntry.to_dict."""
+    return {
+        'timestamp': '2024-01-01T00:00:00.000000',
+        'level': 'INFO',
+        'message': message,
+        'session_id': session_id,
+        'context': context
+    }
+
+
+def test_clear_session_keeps_other_sessions(redis_storage):
+    """Очистка сессии удаляет только ее записи и сохраняет порядок."""
+    redis_storage.add_logs([
+        _entry("a1", "a"),
+        _entry("b1", "b"),
+        _entry("a2", "a"),
+        _entry("b2", "b"),
+    ])
+
+    redis_storage.clear_logs("a")
+
+    assert [e.message for e in redis_storage.get_logs()] == ["b2", "b1"]
+    assert redis_storage.get_logs(session_id="a") == []
+
+
+def test_clear_session_ignores_id_in_text(redis_storage):
+    """ID сессии в тексте или context другой записи не приводит к удалению."""
+    redis_storage.add_logs([
+        _entry("сессия a завершена", "b", context={"session_id": "a"}),
+        _entry("a", "a"),
+    ])
+    redis_storage.redis_client.lpush(redis_storage.log_key, "not json a")
+
+    redis_storage.clear_logs("a")
+
+    logs = redis_storage.redis_client.lrange(redis_storage.log_key, 0, -1)
+    assert logs[0] == b"not json a"
+    assert len(logs) == 2
+    assert [e.session_id for e in redis_storage.get_logs(session_id="b")] == ["b"]
+
+
+def test_clear_all(redis_storage):
+    """Очистка без сессии удаляет все записи."""
+    redis_storage.add_logs([_entry("a1", "a"), _entry("b1", "b")])
+    redis_storage.clear_logs()
+    assert redis_storage.get_logs() == []
+
+
+def _file_lines(storage):
+    """Строки файла логов."""
+    return storage.logs_file.read_text(encoding='utf-8').splitlines()
+
+
+def test_file_storage_compacts_file(tmp_path):
+    """Файл переписывается, когда строк становится больше max_logs на 25%."""
+    storage = FileLogStorage(tmp_path, max_logs=8)
+    for i in range(30):
+        storage.add_logs([_entry(f"m{i}", "s")])
+        assert len(_file_lines(storage)) <= 10
+
+    messages = [json.loads(line)['message'] for line in _file_lines(storage)]
+    assert messages == [f"m{i}" for i in range(30 - len(messages), 30)]
+    assert [e.message for e in storage.get_logs()] == [f"m{i}" for i in range(22, 30)]
+
+
+def test_file_storage_reload(tmp_path):
+    """После перезапуска загружаются последние max_logs целых строк."""
+    storage = FileLogStorage(tmp_path, max_logs=5)
+    storage.add_logs([_entry(f"m{i}", "s") for i in range(4)])
+    # Недописанная строка после аварийного завершения
+    with open(storage.logs_file, 'a', encoding='utf-8') as f:
+        f.write('{"message": "обрыв')
+
+    reloaded = FileLogStorage(tmp_path, max_logs=5)
+    assert [e.message for e in reloaded.get_logs()] == ["m0", "m1", "m2", "m3"]
+
+
+def test_file_storage_clear_session_persists(tmp_path):
+    """Очистка сессии переписывает файл."""
+    storage = FileLogStorage(tmp_path, max_logs=10)
+    storage.add_logs([_entry("a1", "a"), _entry("b1", "b"), _entry("a2", "a")])
+    storage.clear_logs("a")
+    storage.add_logs([_entry("b2", "b")])
+
+    reloaded = FileLogStorage(tmp_path, max_logs=10)
+    assert [e.message for e in reloaded.get_logs()] == ["b1", "b2"]
+
+
+def test_file_storage_migrates_legacy_json(tmp_path):
+    """Логи прежнего формата (JSON массив) переносятся в JSON Lines."""
+    legacy = [_entry(f"m{i}", "s") for i in range(6)]
+    (tmp_path / 'parsing_logs.json').write_text(json.dumps(legacy), encoding='utf-8')
+
+    storage = FileLogStorage(tmp_path, max_logs=4)
+
+    assert [e.message for e in storage.get_logs()] == ["m2", "m3", "m4", "m5"]
+    assert [json.loads(line)['message'] for line in _file_lines(storage)] == ["m2", "m3", "m4", "m5"]
@@ -0,0 +1,116 @@
+"""Тесты пула Ollama endpoint'ов."""
+import pytest
+import requests
+
+from src.services.ollama_endpoints import OllamaEndpointPool
+from src.services.ollama_service import OllamaService
+
+
+class _FakeResponse:
+    """Минимальный ответ requests для _post_json."""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeSession:
+    """Сессия, отвечающая заданным статусом по каждому endpoint'у."""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.calls = []
+
+    def post(self, url, **kwargs):
+        self.calls.append(url)
+        status = self.statuses[url.rsplit("/api/", 1)[0]]
+        if isinstance(status, Exception):
+            raise status
+        return _FakeResponse(status)
+
+
+def _service(statuses):
+    """OllamaService с фиктивной сессией."""
+    service = OllamaService(base_urls=list(statuses))
+    service.session = _FakeSession(statuses)
+    return service
+
+
+def test_pool_requires_urls():
+    """Пустой список endpoint'ов недопустим."""
+    with pytest.raises(ValueError):
+        OllamaEndpointPool(["", "  "])
+
+
+def test_pool_skips_quarantined_endpoint():
+    """Endpoint в карантине не выбирается, пока есть здоровые."""
+    pool = OllamaEndpointPool(["http://a", "http://b"], backoff_secs=60)
+    pool.record_failure("http://a")
+    assert {pool.next_endpoint() for _ in range(20)} == {"http://b"}
+
+
+def test_pool_all_quarantined_returns_earliest():
+    """Если все в карантине, выбирается освобождающийся раньше."""
+    pool = OllamaEndpointPool(["http://a", "http://b"], backoff_secs=60)
+    pool.record_failure("http://a")
+    pool.record_failure("http://b")
+    assert pool.next_endpoint() == "http://a"
+    assert pool.next_endpoint(exclude=["http://a", "http://b"]) is None
+
+
+def test_pool_success_lifts_quarantine():
+    """Успешный запрос снимает карантин."""
+    pool = OllamaEndpointPool(["http://a", "http://b"], backoff_secs=60)
+    pool.record_failure("http://a")
+    pool.record_success("http://a", 0.1, kind="/api/chat")
+    assert "http://a" in {pool.next_endpoint(kind="/api/chat") for _ in range(50)}
+
+
+def test_pool_latency_is_tracked_per_kind():
+    """Латентность embedding и генерации не смешивается."""
+    pool = OllamaEndpointPool(["http://a"], alpha=1.0)
+    pool.record_success("http://a", 0.05, kind="/api/embed")
+    pool.record_success("http://a", 30.0, kind="/api/chat")
+    pool.record_success("http://a", None, kind="/api/generate")
+
+    latency = pool._stats["http://a"].latency
+    assert latency == pytest.approx({"/api/embed": 0.05, "/api/chat": 30.0})
+
+
+def test_post_json_fails_over_on_server_error():
+    """Ответ 5xx переводит endpoint в карантин и запрос уходит на другой."""
+    service = _service({"http://a": 503, "http://b": 200})
+    # b в бессрочном карантине: первым выбирается a, b — только как последний
+    service._endpoints._stats["http://b"].resume_at = float("inf")
+    response = service._post_json("/api/chat", {}, timeout=1)
+
+    assert response.status_code == 200
+    assert service.session.calls == ["http://a/api/chat", "http://b/api/chat"]
+    assert service._endpoints._stats["http://a"].resume_at > 0
+
+
+def test_post_json_returns_last_error_response():
+    """Если 5xx/429 ответили все endpoint'ы, возвращается последний ответ."""
+    service = _service({"http://a": 429, "http://b": 500})
+    response = service._post_json("/api/generate", {}, timeout=1)
+
+    assert response.status_code in (429, 500)
+    assert len(service.session.calls) == 2
+
+
+def test_post_json_raises_when_all_unreachable():
+    """Сетевая ошибка на всех endpoint'ах пробрасывается."""
+    error = requests.ConnectionError("down")
+    service = _service({"http://a": error, "http://b": error})
+    with pytest.raises(requests.ConnectionError):
+        service._post_json("/api/embed", {}, timeout=1)
+
+
+def test_post_json_skips_latency_for_stream():
+    """Для потокового ответа латентность не учитывается."""
+    service = _service({"http://a": 200})
+    service._post_json("/api/chat", {}, timeout=1, stream=True)
+    assert service._endpoints._stats["http://a"].latency == {}
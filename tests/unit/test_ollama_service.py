@@ -0,0 +1,91 @@
+"""Тесты потокового чтения JSON из ответа Ollama."""
+import pytest
+
+from src.services.ollama_service import OllamaService, _JsonObjectScanner
+
+
+def _feed_all(chunks):
+    """Индекс закрытия объекта по фрагментам: (номер фрагмента, индекс)."""
+    scanner = _JsonObjectScanner()
+    for n, chunk in enumerate(chunks):
+        end = scanner.feed(chunk)
+        if end != -1:
+            return n, end
+    return None
+
+
+def test_scanner_finds_end_of_object():
+    """Закрывающая скобка верхнего уровня находится во фрагменте."""
+    assert _feed_all(['{"a": {"b": 1}} tail']) == (0, 14)
+
+
+def test_scanner_across_chunks():
+    """Вложенность учитывается между фрагментами."""
+    assert _feed_all(['Ответ: {"a": ', '{"b": [1, 2]}', '}', ' ещё']) == (2, 0)
+
+
+@pytest.mark.parametrize("text", [
+    '{"text": "скобка } внутри строки"}',
+    '{"text": "кавычка \\" и }"}',
+    '{"text": "обратный слеш \\\\"}',
+])
+def test_scanner_ignores_braces_in_strings(text):
+    """Скобки и экранированные кавычки внутри строк не сбивают подсчет."""
+    assert _feed_all([text]) == (0, len(text) - 1)
+
+
+def test_scanner_split_escape():
+    """Escape-последовательность, разорванная между фрагментами."""
+    assert _feed_all(['{"t": "a\\', '"}', '"}']) == (2, 1)
+
+
+def test_scanner_ignores_text_before_object():
+    """Кавычки и скобки до начала объекта не учитываются."""
+    assert _feed_all(['"привет" } ', '{}']) == (1, 1)
+
+
+def test_scanner_incomplete_object():
+    """Незакрытый объект не дает индекса."""
+    assert _feed_all(['{"a": {"b": 1}']) is None
+
+
+class _Stream:
+    """Поток дельт с отметкой о закрытии."""
+
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.consumed == len(self.deltas):
+            raise StopIteration
+        self.consumed += 1
+        return self.deltas[self.consumed - 1]
+
+    def close(self):
+        self.closed = True
+
+
+def test_chat_stream_until_json_stops_after_object():
+    """Поток обрывается на закрытии объекта, хвост не читается."""
+    service = OllamaService(base_url="http://ollama.test")
+    stream = _Stream(['{"is_news": ', 'true}', ' Вот ответ', ' и еще текст'])
+    service.stream_chat = lambda *args, **kwargs: stream
+
+    assert service.chat_stream_until_json([{"role": "user", "content": "x"}]) == '{"is_news": true}'
+    assert stream.consumed == 2
+    assert stream.closed
+
+
+def test_chat_stream_until_json_without_object():
+    """Без JSON возвращается весь текст."""
+    service = OllamaService(base_url="http://ollama.test")
+    stream = _Stream(['нет ', 'json'])
+    service.stream_chat = lambda *args, **kwargs: stream
+
+    assert service.chat_stream_until_json([{"role": "user", "content": "x"}]) == 'нет json'
+    assert stream.closed
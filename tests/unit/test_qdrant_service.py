@@ -0,0 +1,142 @@
+"""Тесты кэша поиска Qdrant."""
+import functools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+from src.services import qdrant_service
+from src.services.qdrant_service import QdrantService, _SimilarityCache, _normalized
+
+CONTEXT = ("habr", 5, 0.9, 64, ())
+
+
+def _unit(seed, size=16):
+    """Случайный нормализованный вектор."""
+    return _normalized(np.random.default_rng(seed).normal(size=size))
+
+
+def _near(vector, cosine):
+    """Нормализованный вектор с заданной близостью к vector."""
+    other = np.random.default_rng(99).normal(size=vector.shape[0])
+    other -= other.dot(vector) * vector
+    other /= np.linalg.norm(other)
+    return _normalized(cosine * vector + np.sqrt(1.0 - cosine ** 2) * other)
+
+
+def test_hit_within_eps():
+    """Запрос в пределах eps отвечается из кэша, за пределами — нет."""
+    cache = _SimilarityCache(maxsize=4, eps=0.01, ttl=60)
+    query = _unit(1)
+    cache.put(CONTEXT, query, [{"qdrant_id": "a", "score": 0.95}])
+
+    assert cache.get(CONTEXT, _near(query, 0.995)) == [{"qdrant_id": "a", "score": 0.95}]
+    assert cache.get(CONTEXT, _near(query, 0.98)) is None
+
+
+def test_context_must_match():
+    """Те же векторы с другими параметрами поиска не совпадают."""
+    cache = _SimilarityCache(maxsize=4, eps=0.01, ttl=60)
+    query = _unit(1)
+    cache.put(CONTEXT, query, [])
+
+    assert cache.get(("habr", 10, 0.9, 64, ()), query) is None
+    assert cache.get(("reddit",) + CONTEXT[1:], query) is None
+
+
+def test_returns_copies():
+    """Изменение результата не портит кэш."""
+    cache = _SimilarityCache(maxsize=4, eps=0.01, ttl=60)
+    query = _unit(1)
+    cache.put(CONTEXT, query, [{"qdrant_id": "a"}])
+
+    cache.get(CONTEXT, query)[0]["qdrant_id"] = "changed"
+    assert cache.get(CONTEXT, query) == [{"qdrant_id": "a"}]
+
+
+def test_ttl_expiry(monkeypatch):
+    """Запись перестает отдаваться после TTL."""
+    now = [100.0]
+    monkeypatch.setattr(qdrant_service.time, "monotonic", lambda: now[0])
+
+    cache = _SimilarityCache(maxsize=4, eps=0.01, ttl=30)
+    query = _unit(1)
+    cache.put(CONTEXT, query, [])
+
+    now[0] += 29
+    assert cache.get(CONTEXT, query) == []
+    now[0] += 2
+    assert cache.get(CONTEXT, query) is None
+
+
+def test_lru_eviction():
+    """При переполнении вытесняется давно не использованная запись."""
+    cache = _SimilarityCache(maxsize=2, eps=0.01, ttl=60)
+    first, second, third = _unit(1), _unit(2), _unit(3)
+    cache.put(CONTEXT, first, [{"n": 1}])
+    cache.put(CONTEXT, second, [{"n": 2}])
+
+    cache.get(CONTEXT, first)
+    cache.put(CONTEXT, third, [{"n": 3}])
+
+    assert cache.get(CONTEXT, first) == [{"n": 1}]
+    assert cache.get(CONTEXT, second) is None
+    assert cache.get(CONTEXT, third) == [{"n": 3}]
+
+
+def test_invalidate_per_source():
+    """Сброс источника не трогает записи других коллекций."""
+    cache = _SimilarityCache(maxsize=4, eps=0.01, ttl=60)
+    reddit_context = ("reddit",) + CONTEXT[1:]
+    habr_query, reddit_query = _unit(1), _unit(2)
+    cache.put(CONTEXT, habr_query, [{"n": 1}])
+    cache.put(reddit_context, reddit_query, [{"n": 2}])
+
+    cache.invalidate("habr")
+    assert cache.get(CONTEXT, habr_query) is None
+    assert cache.get(reddit_context, reddit_query) == [{"n": 2}]
+
+    # Освобожденный слот переиспользуется
+    cache.put(CONTEXT, habr_query, [{"n": 3}])
+    assert cache.get(CONTEXT, habr_query) == [{"n": 3}]
+
+    cache.invalidate()
+    assert cache.get(reddit_context, reddit_query) is None
+
+
+@pytest.fixture
+def service():
+    """QdrantService поверх in-memory Qdrant."""
+    svc = QdrantService.__new__(QdrantService)
+    svc.url = ":memory:"
+    svc.client = QdrantClient(":memory:")
+    svc._seen = OrderedDict()
+    svc._seen_lock = threading.Lock()
+    svc._sim_cache = _SimilarityCache(maxsize=16, eps=0.002, ttl=300)
+    svc._text_search_cache = functools.lru_cache(maxsize=8)(svc._search_by_text_hash)
+    svc._ensure_all_collections()
+    return svc
+
+
+def test_search_uses_cache_until_write(service):
+    """Повторный поиск идет из кэша, запись в коллекцию его сбрасывает."""
+    vector = _unit(1, size=768)
+    service.save_embedding("habr", vector, {"title": "first"})
+
+    calls = []
+    search = service.client.search
+    service.client.search = lambda *args, **kwargs: calls.append(1) or search(*args, **kwargs)
+
+    assert service.search_similar("habr", vector)[0]["title"] == "first"
+    assert service.search_similar("habr", vector)[0]["title"] == "first"
+    assert len(calls) == 1
+
+    service.save_embedding("reddit", vector, {"title": "other"})
+    service.search_similar("habr", vector)
+    assert len(calls) == 1
+
+    service.save_embedding("habr", _unit(2, size=768), {"title": "second"})
+    service.search_similar("habr", vector)
+    assert len(calls) == 2